@@ -1,9 +1,13 @@
 from Reversi.HumanPlayer import HumanPlayer
-from board import Board
+from board import Board, oppo
+from evaluation import win_probability
+from record import SQUARES
+from stats import SearchStats
 import datetime
 import random
+import threading
 from math import log, sqrt
-from time import time
+from time import time, perf_counter
 from copy import deepcopy
 
 
@@ -18,30 +22,41 @@ class TreeNode():
         self.n = 0
         self.color = color
         self.child = dict()
+        self.prior = 0  # 先验得分，用于渐进偏置
+        self.untried = []  # 按先验排序、尚未扩展的合法落子
+        self.policy = None  # 估值器给出的落子概率，None 时采用 Roxanne 先验
 
 
-def oppo(color):
+def lower_bound(score, n, z=1.96):
     """
-    交换棋手
-    :return: 切换下一步落子棋手
+    胜率的 Wilson 置信下界
+    :param score: 胜率
+    :param n: 模拟次数
+    :param z: 正态分位数，1.96 对应 95% 置信区间
     """
 
-    if color == 'X':
-        return 'O'
-    return 'X'
+    if n == 0:
+        return 0.0
+    denominator = 1 + z * z / n
+    centre = score + z * z / (2 * n)
+    margin = z * sqrt(score * (1 - score) / n + z * z / (4 * n * n))
+    return (centre - margin) / denominator
 
 
 class SilentGame(object):
     ''' 重构游戏类，模拟下棋过程中，不实时打印棋盘  '''
 
-    def __init__(self, black_player, white_player, board=Board(), current_player=None):
+    def __init__(self, black_player, white_player, board=Board(), current_player=None, cache=None, record=False):
         self.board = deepcopy(board)  # 棋盘
+        self.cache = cache  # 局面缓存（见 cache.py），None 表示不缓存
         # 定义棋盘上当前下棋棋手，先默认是 None
         self.current_player = current_player
         self.black_player = black_player  # 黑棋一方
         self.white_player = white_player  # 白棋一方
         self.black_player.color = "X"
         self.white_player.color = "O"
+        # 落子序列，每步为 行 * 8 + 列，可直接写入棋谱；只在 record=True 时记录，树搜索的模拟不需要
+        self.moves = bytearray() if record else None
 
     def switch_player(self, black_player, white_player):
         """
@@ -97,10 +112,11 @@ class SilentGame(object):
 
         return winner, diff
 
-    def run(self):
+    def run(self, max_plies=None):
         """
         运行游戏
-        :return:
+        :param max_plies: 最多模拟的步数，None 表示下到终局
+        :return: 赢家和棋子差，未到终局就截断时返回 None, -1
         """
         # 定义统计双方下棋时间
         total_time = {"X": 0, "O": 0}
@@ -109,6 +125,7 @@ class SilentGame(object):
         # 初始化胜负结果和棋子差
         winner = None
         diff = -1
+        plies = 0
 
         # 游戏开始
         while True:
@@ -120,7 +137,7 @@ class SilentGame(object):
             # 判断当前下棋方
             color = "X" if self.current_player == self.black_player else "O"
             # 获取当前下棋方合法落子位置
-            legal_actions = list(self.board.get_legal_actions(color))
+            legal_actions = self.legal_actions(color)
             # print("%s合法落子坐标列表："%color,legal_actions)
             if len(legal_actions) == 0:
                 # 判断游戏是否结束
@@ -132,24 +149,45 @@ class SilentGame(object):
                     # 另一方有合法位置,切换下棋方
                     continue
 
+            if max_plies is not None and plies >= max_plies:
+                # 达到截断步数，交由调用方做静态估值
+                break
+
             action = self.current_player.get_move(self.board)
 
             if action is None:
                 continue
             else:
-                self.board._move(action, color)
+                if self.cache is None:
+                    self.board._move(action, color)
+                else:
+                    self.cache.move(self.board, action, color)
+                if self.moves is not None:
+                    self.moves.append(SQUARES[action])
+                plies += 1
                 if self.game_over():
                     winner, diff = self.board.get_winner()  # 得到赢家 0,1,2
                     break
 
         return winner, diff
 
+    def legal_actions(self, color):
+        """
+        :return: color 一方的合法落子列表
+        """
+
+        if self.cache is None:
+            return list(self.board.get_legal_actions(color))
+        return self.cache.legal_actions(self.board, color)
+
     def game_over(self):
         """
         判断游戏是否结束
         :return: True/False 游戏结束/游戏没有结束
         """
 
+        if self.cache is not None:
+            return self.cache.game_over(self.board)
         # 根据当前棋盘，判断棋局是否终止
         # 如果当前选手没有合法下棋的位子，则切换选手；如果另外一个选手也没有合法的下棋位置，则比赛停止。
         b_list = list(self.board.get_legal_actions('X'))
@@ -165,11 +203,13 @@ class RoxannePlayer(object):
     ''' Roxanne 策略 详见 《Analysis of Monte Carlo Techniques in Othello》 '''
     ''' 提出者：Canosa, R. Roxanne canosa homepage. https://www.cs.rit.edu/~rlc/ '''
 
-    def __init__(self, color):
+    def __init__(self, color, rng=None, cache=None):
         """
         Roxanne策略初始化
         :param roxanne_table: 从上到下依次按落子优先级排序
         :param color: 执棋方
+        :param rng: 打乱同一优先级落子所用的随机数生成器（random.Random），None 表示使用全局 random
+        :param cache: 局面缓存（见 cache.py），None 表示不缓存
         """
 
         self.roxanne_table = [
@@ -184,6 +224,28 @@ class RoxannePlayer(object):
             ['A2', 'H2', 'A7', 'H7', 'B1', 'G1', 'B8', 'G8']
         ]
         self.color = color
+        self.rng = random if rng is None else rng
+        self.cache = cache
+
+    def rank(self, move):
+        """
+        查询落子在 Roxanne 表中的优先级
+        :param move: 落子坐标，比如 A1
+        :return: 优先级，0 表示最优先
+        """
+
+        for i, move_list in enumerate(self.roxanne_table):
+            if move in move_list:
+                return i
+        return len(self.roxanne_table)
+
+    def prior(self, move):
+        """
+        把 Roxanne 优先级换算为 [0,1] 区间内的先验得分
+        :return: 先验得分，角为 1，X/C 位为 0
+        """
+
+        return 1 - self.rank(move) / (len(self.roxanne_table) - 1)
 
     def roxanne_select(self, board):
         """
@@ -191,12 +253,15 @@ class RoxannePlayer(object):
         :return: 落子策略
         """
 
-        action_list = list(board.get_legal_actions(self.color))
+        if self.cache is None:
+            action_list = list(board.get_legal_actions(self.color))
+        else:
+            action_list = self.cache.legal_actions(board, self.color)
         if len(action_list) == 0:
             return None
         else:
             for move_list in self.roxanne_table:
-                random.shuffle(move_list)
+                self.rng.shuffle(move_list)
                 for move in move_list:
                     if move in action_list:
                         return move
@@ -219,40 +284,134 @@ class RoxannePlayer(object):
 class AIPlayer(object):
     ''' 蒙特卡罗树搜索智能算法 '''
 
-    def __init__(self, color, time_limit=2):
+    PV_TIME_SHARE = 0.2  # 有 pv_playouts 且按 time_limit 限时时，留给 separate 的时间比例
+    STALL_PLAYOUTS = 500  # 连续这么多次模拟都没有新建节点时，认为搜索树已无法再长，按节点数限制的搜索就此结束
+
+    def __init__(self, color, time_limit=2, widen=True, widen_base=3, widen_factor=1.0, widen_power=0.5,
+                 bias=1.0, rollout_depth=None, evaluator=None, batch_size=8, virtual_loss=1,
+                 time_manager=None, ponder=False, ponder_nodes=100000, max_playouts=None, max_nodes=None, seed=None,
+                 max_tree_nodes=None, recycle_ratio=0.75, stats=False, multi_pv=1, pv_playouts=0, cache=None,
+                 time_margin=1):
         """
         蒙特卡洛树搜索策略初始化
         :param color: 执棋方
 
-        :param time_limit: 蒙特卡洛树搜索每步的搜索时间步长
+        :param time_limit: 蒙特卡洛树搜索每步的搜索时间步长，None 表示不限时间
+        :param widen: 是否采用渐进拓宽，False 时一次扩展全部合法落子
+        :param widen_base, widen_factor, widen_power: 访问 n 次的节点最多扩展
+               widen_base + widen_factor * n ** widen_power 个子节点
+        :param bias: 渐进偏置系数，先验得分按 bias * prior / (n + 1) 叠加到 UCT 上
+        :param rollout_depth: 截断模拟的步数，None 表示每次模拟都下到终局
+        :param evaluator: 叶节点批量估值器（见 network.py），None 表示采用 Roxanne 模拟
+        :param batch_size: 每批送给估值器的叶节点数
+        :param virtual_loss: 收集同一批叶节点时，在待估值路径上临时累加的虚拟失败次数
+        :param time_manager: 整局时间管理器（见 timemanager.py），None 表示每步固定思考 time_limit - time_margin 秒
+        :param ponder: 是否在对手思考期间继续后台搜索，并复用与对手实际落子对应的子树；对局结束后需调用 close()
+        :param ponder_nodes: 后台搜索最多新建的节点数，达到后停止后台搜索
+        :param max_playouts: 每步最多模拟次数，None 表示不限
+        :param max_nodes: 每步最多新建的树节点数，None 表示不限
+        :param max_tree_nodes: 搜索树最多保留的节点数，None 表示不限；达到上限时回收访问最少的子树，
+               回收后仍然超限则暂缓扩展
+        :param recycle_ratio: 回收后树的规模降到 max_tree_nodes 的该比例以下
+        :param stats: 是否记录每步搜索的统计信息（见 stats.py），结果保存在 last_stats 中；
+               传入 'memory' 时额外用 tracemalloc 记录内存峰值
+        :param multi_pv: 每步搜索后保留的候选落子数，结果保存在 last_pv 中
+        :param pv_playouts: 主搜索结束后追加的模拟次数，轮流分给访问最少的前 multi_pv 个候选，
+               使候选之间的胜率可以比较；大于 0 时从这些候选中按胜率的置信下界选择落子。
+               追加模拟同样受时间限制，按 time_limit 限时时主搜索让出 PV_TIME_SHARE 的时间
+        :param seed: 随机种子，固定后 Roxanne 模拟可以复现；与 max_playouts/max_nodes 配合可得到确定的搜索结果
+        :param cache: 局面缓存（见 cache.py），由树搜索和模拟共享，None 表示不缓存；不影响搜索结果
+        :param time_margin: 每步为落子和通信预留的时间（秒），对局外使用时可设为 0
         :param tick:记录开始搜索的时间
         :param sim_black, sim_white: 采用Roxanne策略代替随机策略搜索
         """
 
         self.time_limit = time_limit
+        self.widen = widen
+        self.widen_base = widen_base
+        self.widen_factor = widen_factor
+        self.widen_power = widen_power
+        self.bias = bias
+        self.rollout_depth = rollout_depth
+        self.evaluator = evaluator
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        self.time_manager = time_manager
+        self.time_margin = time_margin
+        self.ponder = ponder
+        self.root = None  # 最近一次搜索的根节点
+        self.ponder_root = None
+        self.ponder_board = None
+        self.ponder_thread = None
+        self.ponder_stop = threading.Event()
+        self.ponder_nodes = ponder_nodes
+        self.ponder_cache = None  # 后台搜索期间暂存的局面缓存
+        self.max_playouts = max_playouts
+        self.max_nodes = max_nodes
+        if time_limit is None and time_manager is None and max_playouts is None and max_nodes is None:
+            raise ValueError('至少需要设定一种搜索限制：time_limit、time_manager、max_playouts 或 max_nodes')
+        self.max_tree_nodes = max_tree_nodes
+        self.recycle_ratio = recycle_ratio
+        self.stats = stats
+        self.last_stats = None
+        self.multi_pv = multi_pv
+        self.pv_playouts = pv_playouts
+        self.last_pv = []
+        self.nodes = 0  # 本次搜索新建的节点数
+        self.tree_size = 0  # 当前搜索树的节点数
         self.tick = 0
-        self.sim_black = RoxannePlayer('X')
-        self.sim_white = RoxannePlayer('O')
+        self.rng = random.Random(seed)
+        self.cache = cache
+        self.sim_black = RoxannePlayer('X', self.rng, cache)
+        self.sim_white = RoxannePlayer('O', self.rng, cache)
         self.color = color
 
-    def mcts(self, board):
+    def mcts(self, board, root=None):
         """
         蒙特卡洛树搜索，在时间限制范围内，拓展节点搜索结果
+        :param root: 复用的搜索树根节点，None 表示新建
         :return: 选择最佳拓展
         """
 
-        root = TreeNode(None, self.color)
+        if root is None:
+            root = TreeNode(None, self.color)
+            self.tree_size = 1
+        else:
+            self.tree_size = self.subtree_size(root)
+        self.root = root
+        self.nodes = 0
+        playouts = 0
+        stats = None
+        if self.stats:
+            stats = SearchStats(trace_memory=self.stats == 'memory')
+            stats.start()
+            start = perf_counter()
 
         # 设定一个时间停止计算，限定规模
-        while time() - self.tick < self.time_limit - 1:
-            sim_board = deepcopy(board)
-            choice = self.select(root, sim_board)
-            self.expand(choice, sim_board)
-            winner, diff = self.simulate(choice, sim_board)
-            back_score = [1, 0, 0.5][winner]
-            if choice.color == 'X':
-                back_score = 1 - back_score
-            self.back_prop(choice, back_score)
+        stalled = 0
+        while not self.should_stop(root, playouts):
+            nodes = self.nodes
+            if self.evaluator is None:
+                self.playout(root, board, stats)
+                playouts += 1
+            else:
+                self.playout_batch(root, board, stats)
+                playouts += self.batch_size
+            stalled = stalled + 1 if self.nodes == nodes else 0
+            if self.max_nodes is not None and stalled >= self.STALL_PLAYOUTS:
+                # 终局附近搜索树很小，UCT 反复走已展开的变化，max_nodes 可能永远达不到
+                break
+
+        if stats is not None:
+            stats.finish(root, perf_counter() - start, self.nodes, self.tree_size)
+            self.last_stats = stats
+
+        if self.pv_playouts > 0 and len(root.child) > 1:
+            self.separate(root, board, self.multi_pv, self.pv_playouts)
+            self.last_pv = self.principal_variations(root, self.multi_pv)
+            # 访问次数少的候选胜率不可靠，按置信下界比较
+            return max(self.last_pv, key=lambda line: lower_bound(line['score'], line['visits']))['move']
+        self.last_pv = self.principal_variations(root, self.multi_pv)
 
         best_n = -1
         best_move = None
@@ -262,6 +421,362 @@ class AIPlayer(object):
                 best_move = k
         return best_move
 
+    def principal_variations(self, root, k, depth=10):
+        """
+        访问次数最多的前 k 个根节点落子及各自的主要变例
+        :param k: 候选落子数
+        :param depth: 主要变例的最大长度
+        :return: [{'move', 'visits', 'score', 'pv'}, ...]，按访问次数从多到少；
+                 score 为根节点执棋方的胜率，pv 为从该落子开始、每步取访问最多子节点的落子序列
+        """
+
+        lines = []
+        children = sorted(root.child.items(), key=lambda item: item[1].n, reverse=True)
+        for move, child in children[:k]:
+            pv = [move]
+            node = child
+            while node.child and len(pv) < depth:
+                move_next, node = max(node.child.items(), key=lambda item: item[1].n)
+                if node.n == 0:
+                    break
+                pv.append(move_next)
+            # 子节点的 w / n 是落子一方（即根节点执棋方）的胜率
+            lines.append({'move': pv[0], 'visits': child.n, 'score': child.w / child.n if child.n else 0.5,
+                          'pv': pv})
+        return lines
+
+    def separate(self, root, board, k, playouts):
+        """
+        追加模拟以区分前 k 个候选：每次把模拟分给其中访问最少的一个，从该子节点向下选择、扩展，
+        再用与主搜索相同的方式给叶节点计分（有估值器时批量估值，否则 Roxanne 模拟），使胜率的尺度一致
+        :param playouts: 追加的模拟次数，用完本步的时间时提前结束
+        """
+
+        candidates = sorted(root.child.items(), key=lambda item: item[1].n, reverse=True)[:k]
+        limit = self.time_budget()
+        done = 0
+        while done < playouts:
+            if limit is not None and time() - self.tick >= limit:
+                break
+            if self.tree_full():
+                self.recycle(root)
+            batch = 1 if self.evaluator is None else min(self.batch_size, playouts - done)
+            leaves = []
+            for _ in range(batch):
+                # 虚拟失败计入访问次数，同一批的模拟会分给不同的候选
+                move, child = min(candidates, key=lambda item: item[1].n)
+                sim_board = deepcopy(board)
+                sim_board._move(move, root.color)
+                choice = self.select(child, sim_board)
+                self.expand(choice, sim_board)
+                if self.evaluator is not None:
+                    self.add_virtual_loss(choice, self.virtual_loss)
+                leaves.append((choice, sim_board))
+            if self.evaluator is None:
+                scores = [self.simulate(choice, sim_board) for choice, sim_board in leaves]
+            else:
+                scores = self.evaluate_leaves(leaves)
+            for (choice, _), back_score in zip(leaves, scores):
+                if self.evaluator is not None:
+                    self.add_virtual_loss(choice, -self.virtual_loss)
+                if choice.color == 'X':
+                    back_score = 1 - back_score
+                self.back_prop(choice, back_score)
+            done += batch
+
+    def start_ponder(self, board, action):
+        """
+        落子后在后台线程中继续搜索对手的应对
+        :param board: 落子前的棋盘
+        :param action: 己方落子
+        """
+
+        if self.root is None or action not in self.root.child:
+            return
+        self.ponder_root = self.root.child[action]
+        self.ponder_root.parent = None
+        # 后台搜索只保留这棵子树，回收按它的规模计算
+        self.tree_size = self.subtree_size(self.ponder_root)
+        self.ponder_board = deepcopy(board)
+        self.ponder_board._move(action, self.color)
+        self.ponder_stop.clear()
+        # 局面缓存可能与对手共享且没有加锁，后台搜索期间不使用
+        self.ponder_cache = self.cache
+        self.set_cache(None)
+        self.ponder_thread = threading.Thread(target=self.ponder_loop, args=(self.ponder_root, self.ponder_board),
+                                              daemon=True)
+        self.ponder_thread.start()
+
+    def ponder_loop(self, root, board):
+        """
+        后台搜索，直到 stop_ponder 被调用、新建节点数达到 ponder_nodes 或搜索树不再增长
+        """
+
+        self.nodes = 0
+        stalled = 0
+        while not self.ponder_stop.is_set() and self.nodes < self.ponder_nodes and stalled < self.STALL_PLAYOUTS:
+            nodes = self.nodes
+            if self.evaluator is None:
+                self.playout(root, board)
+            else:
+                self.playout_batch(root, board)
+            stalled = stalled + 1 if self.nodes == nodes else 0
+
+    def stop_ponder(self, board):
+        """
+        停止后台搜索，找出与对手实际落子对应的子树
+        :param board: 当前棋盘
+        :return: 可以复用的子树根节点，没有则返回 None
+        """
+
+        if not self.halt_ponder():
+            return None
+        for move, child in self.ponder_root.child.items():
+            sim_board = deepcopy(self.ponder_board)
+            sim_board._move(move, self.ponder_root.color)
+            if sim_board._board == board._board:
+                # 断开与旧树的联系，旧树的其余部分随即被回收
+                child.parent = None
+                return child
+        return None
+
+    def halt_ponder(self):
+        """
+        停止后台搜索线程并恢复局面缓存
+        :return: 是否有正在进行的后台搜索
+        """
+
+        if self.ponder_thread is None:
+            return False
+        self.ponder_stop.set()
+        self.ponder_thread.join()
+        self.ponder_thread = None
+        self.set_cache(self.ponder_cache)
+        self.ponder_cache = None
+        return True
+
+    def close(self):
+        """
+        对局结束时调用：停止后台搜索并丢弃其搜索树
+        """
+
+        self.halt_ponder()
+        self.ponder_root = None
+        self.ponder_board = None
+
+    def set_cache(self, cache):
+        """
+        更换树搜索和模拟使用的局面缓存
+        """
+
+        self.cache = cache
+        self.sim_black.cache = cache
+        self.sim_white.cache = cache
+
+    def should_stop(self, root, playouts):
+        """
+        判断是否结束本步搜索
+        :param root: 搜索树根节点
+        :param playouts: 已完成的模拟次数
+        :return: True/False 结束/继续搜索
+        """
+
+        if self.max_playouts is not None and playouts >= self.max_playouts:
+            return True
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return True
+        elapsed = time() - self.tick
+        if self.time_manager is not None:
+            return self.time_manager.should_stop(root, elapsed, playouts)
+        if self.time_limit is None:
+            return False
+        limit = self.time_limit - self.time_margin
+        if self.pv_playouts > 0:
+            limit *= 1 - self.PV_TIME_SHARE
+        return elapsed >= limit
+
+    def time_budget(self):
+        """
+        :return: 本步搜索最多用时（秒），None 表示不限时
+        """
+
+        if self.time_manager is not None:
+            return self.time_manager.maximum
+        if self.time_limit is None:
+            return None
+        return self.time_limit - self.time_margin
+
+    def playout(self, root, board, stats=None):
+        """
+        蒙特卡洛树搜索，一次完整的选择、扩展、模拟和反向传播
+        :param stats: 搜索统计，None 表示不统计
+        """
+
+        if self.tree_full():
+            self.recycle(root)
+        if stats is not None:
+            self.playout_timed(root, board, stats)
+            return
+        sim_board = deepcopy(board)
+        choice = self.select(root, sim_board)
+        self.expand(choice, sim_board)
+        back_score = self.simulate(choice, sim_board)
+        if choice.color == 'X':
+            back_score = 1 - back_score
+        self.back_prop(choice, back_score)
+
+    def playout_timed(self, root, board, stats):
+        """
+        与 playout 相同，同时记录各阶段耗时和叶节点深度
+        """
+
+        phase_time = stats.phase_time
+        t0 = perf_counter()
+        sim_board = deepcopy(board)
+        choice = self.select(root, sim_board)
+        t1 = perf_counter()
+        self.expand(choice, sim_board)
+        t2 = perf_counter()
+        back_score = self.simulate(choice, sim_board)
+        t3 = perf_counter()
+        if choice.color == 'X':
+            back_score = 1 - back_score
+        self.back_prop(choice, back_score)
+        t4 = perf_counter()
+        phase_time['select'] += t1 - t0
+        phase_time['expand'] += t2 - t1
+        phase_time['simulate'] += t3 - t2
+        phase_time['back_prop'] += t4 - t3
+        stats.record_leaf(choice)
+
+    def playout_batch(self, root, board, stats=None):
+        """
+        蒙特卡洛树搜索，批量估值：先借助虚拟失败选出一批不同的叶节点，再一次性交给估值器，最后统一反向传播
+        :param stats: 搜索统计，None 表示不统计
+        """
+
+        if self.tree_full():
+            self.recycle(root)
+        if stats is not None:
+            t0 = perf_counter()
+        leaves = []
+        for _ in range(self.batch_size):
+            sim_board = deepcopy(board)
+            choice = self.select(root, sim_board)
+            self.expand(choice, sim_board)
+            self.add_virtual_loss(choice, self.virtual_loss)
+            leaves.append((choice, sim_board))
+        if stats is not None:
+            t1 = perf_counter()
+            # 批量模式下选择和扩展交替进行，合并计入 select
+            stats.phase_time['select'] += t1 - t0
+
+        scores = self.evaluate_leaves(leaves)
+        if stats is not None:
+            t2 = perf_counter()
+            stats.phase_time['evaluate'] += t2 - t1
+
+        for (choice, sim_board), back_score in zip(leaves, scores):
+            self.add_virtual_loss(choice, -self.virtual_loss)
+            if choice.color == 'X':
+                back_score = 1 - back_score
+            self.back_prop(choice, back_score)
+            if stats is not None:
+                stats.record_leaf(choice)
+        if stats is not None:
+            stats.phase_time['back_prop'] += perf_counter() - t2
+
+    def evaluate_leaves(self, leaves):
+        """
+        用估值器批量给叶节点计分，并用估值器给出的落子概率更新叶节点的先验
+        :param leaves: [(叶节点, 叶节点局面), ...]
+        :return: 与 simulate 相同含义的得分列表（黑棋胜率）
+        """
+
+        scores = [None] * len(leaves)
+        pending = []
+        for i, (choice, sim_board) in enumerate(leaves):
+            if not choice.child and not choice.untried and not self.legal_actions(sim_board, choice.color) \
+                    and not self.legal_actions(sim_board, oppo(choice.color)):
+                # 双方都无子可下，直接按终局结果计分；因树满而暂缓扩展的叶节点仍交给估值器
+                winner, diff = sim_board.get_winner()
+                scores[i] = [1, 0, 0.5][winner]
+            else:
+                pending.append(i)
+
+        results = self.evaluator.evaluate_batch([(leaves[i][1], leaves[i][0].color) for i in pending])
+        for i, (value, policy) in zip(pending, results):
+            choice = leaves[i][0]
+            self.apply_policy(choice, policy)
+            scores[i] = value if choice.color == 'X' else 1 - value
+        return scores
+
+    def tree_full(self):
+        """
+        判断搜索树是否达到节点上限
+        """
+
+        return self.max_tree_nodes is not None and self.tree_size >= self.max_tree_nodes
+
+    def subtree_size(self, node):
+        """
+        统计以 node 为根的子树节点数
+        """
+
+        size = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.child.values())
+        return size
+
+    def recycle(self, root):
+        """
+        回收访问次数最少的子树：把这些节点重新变为叶节点，保留其自身的统计，需要时再重新扩展
+        """
+
+        expanded = []
+        stack = [(root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            for child in node.child.values():
+                if child.child:
+                    expanded.append((child.n, -depth, child))
+                    stack.append((child, depth + 1))
+        # 访问次数相同时先回收更深的节点，保证子孙总在祖先之前被回收，节点数不会重复扣减
+        expanded.sort(key=lambda item: item[:2])
+        target = int(self.max_tree_nodes * self.recycle_ratio)
+        for _, _, node in expanded:
+            if self.tree_size <= target:
+                break
+            self.tree_size -= self.subtree_size(node) - 1
+            node.child = dict()
+            node.untried = []
+            node.policy = None
+
+    def add_virtual_loss(self, node, loss):
+        """
+        在从 node 到根节点的路径上累加虚拟失败（只增加访问次数，不增加奖励），loss 为负数时撤销
+        """
+
+        while node is not None:
+            node.n += loss
+            node = node.parent
+
+    def apply_policy(self, node, policy):
+        """
+        用估值器给出的落子概率替换 Roxanne 先验，并据此重新排列尚未扩展的落子
+        """
+
+        if len(policy) == 0:
+            return
+        best = max(policy.values()) or 1
+        node.policy = {move: p / best for move, p in policy.items()}
+        for move, child in node.child.items():
+            child.prior = node.policy.get(move, 0)
+        node.untried.sort(key=lambda move: node.policy.get(move, 0))
+
     def select(self, node, board):
         """
         蒙特卡洛树搜索，节点选择
@@ -271,6 +786,7 @@ class AIPlayer(object):
         if len(node.child) == 0:
             return node
         else:
+            self.widening(node)
             best_score = -1
             best_move = None
             for k in node.child.keys():
@@ -284,10 +800,15 @@ class AIPlayer(object):
                     # 随着访问次数的增加，加号后面的值越来越小，因此我们的选择会更加倾向于选择那些还没怎么被统计过的节点
                     # 避免了蒙特卡洛树搜索会碰到的陷阱——一开始走了歪路。
                     score = w / n + sqrt(2 * log(N) / n)
+                    # 渐进偏置：先验得分的影响随访问次数增加而衰减
+                    score += self.bias * node.child[k].prior / (n + 1)
                     if score > best_score:
                         best_score = score
                         best_move = k
-            board._move(best_move, node.color)
+            if self.cache is None:
+                board._move(best_move, node.color)
+            else:
+                self.cache.move(board, best_move, node.color)
             return self.select(node.child[best_move], board)
 
     def expand(self, node, board):
@@ -295,20 +816,64 @@ class AIPlayer(object):
         蒙特卡洛树搜索，节点扩展
         """
 
-        for move in board.get_legal_actions(node.color):
-            node.child[move] = TreeNode(node, oppo(node.color))
+        moves = self.legal_actions(board, node.color)
+        # 按 Roxanne 优先级逆序排列，pop() 时先取出先验高的落子
+        moves.sort(key=self.sim_black.rank, reverse=True)
+        node.untried = moves
+        self.widening(node)
+
+    def legal_actions(self, board, color):
+        """
+        :return: color 一方的合法落子列表
+        """
+
+        if self.cache is None:
+            return list(board.get_legal_actions(color))
+        return self.cache.legal_actions(board, color)
+
+    def widening(self, node):
+        """
+        蒙特卡洛树搜索，渐进拓宽：节点访问次数增加后，解锁更多先验较低的子节点
+        """
+
+        if self.widen:
+            limit = self.widen_base + int(self.widen_factor * node.n ** self.widen_power)
+        else:
+            # 不拓宽时一次扩展全部合法落子，仅受节点上限约束
+            limit = len(node.child) + len(node.untried)
+        while node.untried and len(node.child) < limit and not self.tree_full():
+            self.add_child(node)
+
+    def add_child(self, node):
+        """
+        取出先验最高的未扩展落子，生成子节点
+        """
+
+        move = node.untried.pop()
+        child = TreeNode(node, oppo(node.color))
+        if node.policy is None:
+            child.prior = self.sim_black.prior(move)
+        else:
+            child.prior = node.policy.get(move, 0)
+        node.child[move] = child
+        self.nodes += 1
+        self.tree_size += 1
 
     def simulate(self, node, board):
         """
         蒙特卡洛树搜索，采用Roxanne策略代替随机策略搜索，模拟扩展搜索树
+        :return: 黑棋的得分，胜 1、负 0、平 0.5；截断模拟时为静态估值换算的黑棋胜率
         """
 
         if node.color == 'O':
             current_player = self.sim_black
         else:
             current_player = self.sim_white
-        sim_game = SilentGame(self.sim_black, self.sim_white, board, current_player)
-        return sim_game.run()
+        sim_game = SilentGame(self.sim_black, self.sim_white, board, current_player, self.cache)
+        winner, diff = sim_game.run(self.rollout_depth)
+        if winner is None:
+            return win_probability(sim_game.board, 'X')
+        return [1, 0, 0.5][winner]
 
     def back_prop(self, node, score):
         """
@@ -332,7 +897,26 @@ class AIPlayer(object):
         else:
             player_name = '白棋'
         # print("请等一会，对方 {}-{} 正在思考中...".format(player_name, self.color))
-        action = self.mcts(deepcopy(board))
+        root = self.stop_ponder(board)
+        if self.time_manager is None:
+            action = self.mcts(deepcopy(board), root)
+        else:
+            legal_actions = self.legal_actions(board, self.color)
+            if len(legal_actions) == 1:
+                # 只有一步可走，无需思考；不保留上一步的候选和统计
+                action = legal_actions[0]
+                self.root = root
+                self.last_stats = None
+                if root is not None and action in root.child:
+                    self.last_pv = self.principal_variations(root, self.multi_pv)
+                else:
+                    self.last_pv = [{'move': action, 'visits': 0, 'score': 0.5, 'pv': [action]}]
+            else:
+                self.time_manager.allot(board)
+                action = self.mcts(deepcopy(board), root)
+            self.time_manager.spend(time() - self.tick)
+        if self.ponder:
+            self.start_ponder(board, action)
         return action
 
 ## 测试AI玩家
@@ -7,12 +7,16 @@ class RandomPlayer:
     随机玩家 RandomPlayer 主要是随机获取一个合法落子位置。后续随机玩家可以跟人类玩家、AI 玩家等进行对弈。
     """
 
-    def __init__(self, color):
+    def __init__(self, color, rng=None, verbose=True):
         """
         玩家初始化
         :param color: 下棋方，'X' - 黑棋，'O' - 白棋
+        :param rng: 随机数生成器（random.Random），None 表示使用全局 random
+        :param verbose: 落子时是否打印提示，批量对局时关闭
         """
         self.color = color
+        self.rng = random if rng is None else rng
+        self.verbose = verbose
 
     def random_choice(self, board):
         """
@@ -27,7 +31,7 @@ class RandomPlayer:
         if len(action_list) == 0:
             return None
         else:
-            return random.choice(action_list)
+            return self.rng.choice(action_list)
 
     def get_move(self, board):
         """
@@ -39,6 +43,7 @@ class RandomPlayer:
             player_name = '黑棋'
         else:
             player_name = '白棋'
-        print("请等一会，对方 {}-{} 正在思考中...".format(player_name, self.color))
+        if self.verbose:
+            print("请等一会，对方 {}-{} 正在思考中...".format(player_name, self.color))
         action = self.random_choice(board)
         return action
@@ -0,0 +1,194 @@
+"""
+批量局面分析：把一批局面分发到进程池，每个局面用固定预算的 AIPlayer 搜索，
+按完成顺序逐个返回最佳落子、胜率和访问最多的若干候选。输入逐个读取、在途任务数有上限，
+内存占用与局面总数无关。
+
+输入文件每行一个局面，可以是：
+    落子序列               F5 D6 C3 D3 C4
+    棋盘字符串 + 执棋方    ...........................OX......XO........................... X
+    JSON                   {"id": "p1", "moves": "F5 D6", "playouts": 2000}
+                           {"board": "...", "color": "O", "time": 1.5}
+
+    python analysis.py positions.txt --playouts 1000 --top 3 --workers 8 > results.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from AIPlayer import AIPlayer
+from board import Board, oppo
+from record import final_position
+
+
+def parse_position(item, color='X'):
+    """
+    解析一个待分析的局面
+    :param item: Board、(Board, 执棋方)、字典或输入文件中的一行
+    :param color: item 为 Board 时的执棋方
+    :return: (棋盘, 执棋方, 其余选项字典)
+    :raise ValueError: 落子序列中有非法落子或不存在的坐标
+    """
+
+    if isinstance(item, Board):
+        return item, color, {}
+    if isinstance(item, tuple):
+        return item[0], item[1], {}
+    if isinstance(item, str):
+        line = item.strip()
+        if line.startswith('{'):
+            item = json.loads(line)
+        else:
+            fields = line.split()
+            cells = ''.join(fields)
+            if len(cells) in (64, 65) and not set(cells) - set('.-XO*xo'):
+                item = {'board': cells[:64], 'color': cells[64:].upper() or color}
+            else:
+                item = {'moves': fields}
+    options = dict(item)
+    if 'board' in options:
+        board = Board.from_string(options.pop('board'))
+        side = options.pop('color', color).upper().replace('*', 'X')
+    else:
+        board, side = final_position(options.pop('moves', ''))
+    return board, side, options
+
+
+def read_positions(path):
+    """
+    逐行读取局面文件，跳过空行和 # 开头的注释
+    :param path: 文件路径，'-' 表示标准输入
+    :return: 生成输入行
+    """
+
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def analyse(board, color, kwargs, top_k=3):
+    """
+    分析单个局面
+    :param board: 棋盘
+    :param color: 执棋方，无子可下时自动换到对方
+    :param kwargs: AIPlayer 的参数
+    :param top_k: 返回的候选落子数
+    :return: {'color', 'best', 'score', 'playouts', 'top'}，score 为执棋方胜率，top 的每一项带有主要变例 pv；
+             终局时 best 为 None
+    """
+
+    if not list(board.get_legal_actions(color)):
+        if not list(board.get_legal_actions(oppo(color))):
+            winner, _ = board.get_winner()
+            mover = 0 if color == 'X' else 1
+            score = 0.5 if winner == 2 else float(winner == mover)
+            return {'color': color, 'best': None, 'score': score, 'playouts': 0, 'top': []}
+        color = oppo(color)
+
+    player = AIPlayer(color, **dict(kwargs, multi_pv=max(top_k, kwargs.get('multi_pv', 1))))
+    best = player.get_move(board)
+    player.close()
+    root = player.root
+    top = player.last_pv[:top_k]
+    score = root.child[best].w / max(root.child[best].n, 1) if best in root.child else 0.5
+    return {'color': color, 'best': best, 'score': score, 'playouts': root.n, 'top': top}
+
+
+def _analyse_task(index, board, color, kwargs, top_k, extra):
+    result = analyse(board, color, kwargs, top_k)
+    result['index'] = index
+    result.update(extra)
+    return result
+
+
+def analyse_batch(positions, kwargs=None, top_k=3, workers=None, seed=None, color='X'):
+    """
+    并行分析一批局面，按完成顺序逐个返回结果
+    :param positions: 可迭代对象，元素为 parse_position() 接受的任意形式；
+                      字典或 JSON 行中可用 playouts / time 覆盖该局面的搜索预算，id 会原样带回
+    :param kwargs: AIPlayer 的参数，None 表示每个局面 1000 次模拟
+    :param top_k: 每个局面返回的候选落子数
+    :param workers: 进程数，None 表示全部 CPU 核
+    :param seed: 随机种子，相同输入与种子时每个局面的结果可复现
+    :param color: 输入为 Board 时的执棋方
+    :return: 生成结果字典，index 为该局面在输入中的序号；某个局面无法解析或分析出错时，
+             该局面的结果为 {'index', 'error'}，其余局面照常分析
+    """
+
+    if kwargs is None:
+        kwargs = {'time_limit': None, 'max_playouts': 1000}
+    rng = random.Random(seed)
+    workers = workers or os.cpu_count()
+    pending = {}  # future -> 局面序号
+    failed = []  # 解析出错的局面，等待返回
+    items = enumerate(positions)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def submit():
+            for index, item in items:
+                try:
+                    board, side, options = parse_position(item, color)
+                except Exception as e:
+                    # 解析出错的局面不占用进程，记下错误后继续读入下一个
+                    failed.append({'index': index, 'error': '{}: {}'.format(type(e).__name__, e)})
+                    continue
+                budget = dict(kwargs, seed=rng.randrange(2 ** 32))
+                if 'playouts' in options:
+                    budget.update(max_playouts=options.pop('playouts'), time_limit=None)
+                if 'time' in options:
+                    budget.update(time_limit=options.pop('time'), time_margin=0, max_playouts=None)
+                pending[pool.submit(_analyse_task, index, board, side, budget, top_k, options)] = index
+                return True
+            return False
+
+        # 保持进程池饱和，但不一次读入全部输入
+        while len(pending) < 2 * workers and submit():
+            pass
+        while pending or failed:
+            while failed:
+                yield failed.pop(0)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield {'index': index, 'error': '{}: {}'.format(type(e).__name__, e)}
+                submit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='批量局面分析')
+    parser.add_argument('input', help='局面文件，- 表示标准输入')
+    parser.add_argument('--playouts', type=int, default=1000, help='每个局面的模拟次数')
+    parser.add_argument('--time', type=float, default=None, help='每个局面的搜索时间（秒），设置后不限模拟次数')
+    parser.add_argument('--top', type=int, default=3, help='返回的候选落子数')
+    parser.add_argument('--separate', type=int, default=0, help='主搜索后追加给前 top 个候选的模拟次数')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认全部 CPU 核')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--output', default=None, help='结果输出路径（JSON 行），默认标准输出')
+    args = parser.parse_args()
+
+    if args.time is None:
+        player_kwargs = {'time_limit': None, 'max_playouts': args.playouts}
+    else:
+        player_kwargs = {'time_limit': args.time, 'time_margin': 0}
+    player_kwargs.update(multi_pv=args.top, pv_playouts=args.separate)
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for result in analyse_batch(read_positions(args.input), player_kwargs, args.top, args.workers, args.seed):
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
@@ -0,0 +1,176 @@
+"""
+引擎性能基准：固定随机种子的若干场景，测量 MCTS 每秒模拟次数、SilentGame 每秒模拟对局数、
+Roxanne 对随机玩家的每秒对局数以及单次搜索的内存峰值。结果写成 JSON，并可与保存的基线比较，
+吞吐下降或内存上升超过容差时以非零状态码退出。
+
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --tolerance 0.1 --output result.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+
+from AIPlayer import AIPlayer, RoxannePlayer, SilentGame
+from RandomPlayer import RandomPlayer
+from record import final_position
+
+# 各项指标的方向：True 表示越大越好，False 表示越小越好
+METRICS = {
+    'mcts_playouts_per_second': True,
+    'rollouts_per_second': True,
+    'games_per_second': True,
+    'peak_memory_bytes': False,
+}
+
+POSITIONS = {
+    'start': '',
+    'midgame': 'E6 F4 G3 C6 C5 E7 C7 B7 F5 B6 A8 B8 B5 D7 C8 D8 E8 B4 A4 G6',
+}
+
+
+def bench_mcts(playouts, seed):
+    """
+    MCTS 每秒模拟次数，取各测试局面的平均值
+    """
+
+    rates = []
+    for moves in POSITIONS.values():
+        board, color = final_position(moves)
+        player = AIPlayer(color, time_limit=None, max_playouts=playouts, seed=seed)
+        start = perf_counter()
+        player.get_move(board)
+        rates.append(playouts / (perf_counter() - start))
+    return sum(rates) / len(rates)
+
+
+def bench_rollouts(rollouts, seed):
+    """
+    从初始局面用 Roxanne 策略模拟到终局，每秒对局数
+    """
+
+    rng = random.Random(seed)
+    black, white = RoxannePlayer('X', rng), RoxannePlayer('O', rng)
+    board, _ = final_position('')
+    start = perf_counter()
+    for _ in range(rollouts):
+        SilentGame(black, white, board).run()
+    return rollouts / (perf_counter() - start)
+
+
+def bench_games(games, seed):
+    """
+    Roxanne 对随机玩家（交换先后手），每秒对局数
+    """
+
+    rng = random.Random(seed)
+    start = perf_counter()
+    for i in range(games):
+        roxanne, rand = RoxannePlayer('X', rng), RandomPlayer('O', rng, verbose=False)
+        if i % 2 == 0:
+            SilentGame(roxanne, rand).run()
+        else:
+            SilentGame(rand, roxanne).run()
+    return games / (perf_counter() - start)
+
+
+def bench_memory(playouts, seed):
+    """
+    单次搜索期间的内存峰值（字节）
+    """
+
+    board, color = final_position(POSITIONS['midgame'])
+    player = AIPlayer(color, time_limit=None, max_playouts=playouts, seed=seed)
+    tracemalloc.start()
+    try:
+        player.get_move(board)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(scale=1.0, seed=2024, repeat=3):
+    """
+    运行全部场景
+    :param scale: 工作量倍数，小于 1 时用于快速检查
+    :param seed: 随机种子
+    :param repeat: 吞吐类场景重复次数，取最好成绩以减小机器负载带来的波动
+    :return: 结果字典
+    """
+
+    def amount(n):
+        return max(int(n * scale), 1)
+
+    def best(bench, n):
+        return max(bench(amount(n), seed) for _ in range(repeat))
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'scale': scale,
+        'seed': seed,
+        'repeat': repeat,
+        'metrics': {
+            'mcts_playouts_per_second': best(bench_mcts, 200),
+            'rollouts_per_second': best(bench_rollouts, 100),
+            'games_per_second': best(bench_games, 100),
+            'peak_memory_bytes': bench_memory(amount(200), seed),
+        },
+    }
+
+
+def compare(result, baseline, tolerance):
+    """
+    与基线比较
+    :param tolerance: 允许的相对退化比例，比如 0.1 表示 10%
+    :return: [(指标, 当前值, 基线值, 相对变化, 是否退化), ...]
+    """
+
+    rows = []
+    for name, higher_is_better in METRICS.items():
+        if name not in baseline['metrics']:
+            continue
+        value, base = result['metrics'][name], baseline['metrics'][name]
+        change = (value - base) / base if base else 0.0
+        if higher_is_better:
+            regressed = change < -tolerance
+        else:
+            regressed = change > tolerance
+        rows.append((name, value, base, change, regressed))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='引擎性能基准')
+    parser.add_argument('--output', default=None, help='结果 JSON 输出路径')
+    parser.add_argument('--baseline', default=None, help='用于比较的基线 JSON')
+    parser.add_argument('--save-baseline', default=None, help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的相对退化比例')
+    parser.add_argument('--scale', type=float, default=1.0, help='工作量倍数')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    parser.add_argument('--repeat', type=int, default=3, help='吞吐类场景重复次数，取最好成绩')
+    args = parser.parse_args()
+
+    result = run(args.scale, args.seed, args.repeat)
+    for name, value in result['metrics'].items():
+        print('{:28} {:14.2f}'.format(name, value))
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(result, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != result['scale'] or baseline.get('seed') != result['seed']:
+            print('\n警告：基线的 scale/seed 与本次不同，结果不可比')
+        failed = False
+        print()
+        for name, value, base, change, regressed in compare(result, baseline, args.tolerance):
+            failed = failed or regressed
+            print('{:28} {:14.2f} 基线 {:14.2f} {:+7.1%} {}'.format(name, value, base, change,
+                                                                   '退化' if regressed else 'ok'))
+        sys.exit(1 if failed else 0)
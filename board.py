@@ -66,6 +66,56 @@ class Board(object):
                     count += 1
         return count
 
+    def bitboards(self):
+        """
+        把棋盘转换为黑白双方的 64 位掩码，第 i 行第 j 列对应第 i * 8 + j 位
+        :return: (黑棋掩码, 白棋掩码)
+        """
+        black, white = 0, 0
+        bit = 1
+        for row in self._board:
+            for cell in row:
+                if cell == 'X':
+                    black |= bit
+                elif cell == 'O':
+                    white |= bit
+                bit <<= 1
+        return black, white
+
+    @classmethod
+    def from_bitboards(cls, black, white):
+        """
+        由 bitboards() 的结果还原棋盘
+        :param black: 黑棋掩码
+        :param white: 白棋掩码
+        :return: 棋盘
+        """
+        board = cls()
+        board._board = [['X' if black >> (i * 8 + j) & 1 else 'O' if white >> (i * 8 + j) & 1 else board.empty
+                         for j in range(8)] for i in range(8)]
+        return board
+
+    def to_string(self):
+        """
+        把棋盘按行展开为 64 个字符的字符串
+        :return: 比如 '...........................OX......XO...........................'
+        """
+        return ''.join(''.join(row) for row in self._board)
+
+    @classmethod
+    def from_string(cls, text):
+        """
+        由 to_string() 的结果还原棋盘，也接受 '-' 表示空格、'*' 表示黑棋
+        :param text: 64 个字符的字符串，空白字符会被忽略
+        :return: 棋盘
+        """
+        cells = ''.join(text.split()).replace('-', '.').replace('*', 'X').upper()
+        if len(cells) != 64 or set(cells) - {'.', 'X', 'O'}:
+            raise ValueError('棋盘字符串格式错误：{}'.format(text))
+        board = cls()
+        board._board = [list(cells[i * 8:i * 8 + 8]) for i in range(8)]
+        return board
+
     def get_winner(self):
         """
         判断黑棋和白旗的输赢，通过棋子的个数进行判断
@@ -282,6 +332,18 @@ class Board(object):
         if col in l and row in l:
             return chr(ord('A') + col) + str(row + 1)
 
+def oppo(color):
+    """
+    交换棋手
+    :param color: 棋子颜色，X-黑棋，O-白棋
+    :return: 对手的棋子颜色
+    """
+
+    if color == 'X':
+        return 'O'
+    return 'X'
+
+
 # # # 测试
 # if __name__ == '__main__':
 #     board = Board()  # 棋盘初始化
@@ -0,0 +1,123 @@
+"""
+按局面缓存合法落子、翻转棋子和终局结果，超出容量时淘汰最久未使用的条目。
+同一局面在一步之内会被对局循环、game_over 和选手反复生成合法落子，共享一个缓存即可避免重复计算；
+返回值与 Board 上的对应方法完全相同，调用方的行为不受影响。
+
+    cache = PositionCache()
+    SilentGame(RoxannePlayer('X', cache=cache), RoxannePlayer('O', cache=cache), cache=cache).run()
+    print(cache.stats())
+"""
+from collections import OrderedDict
+
+
+class PositionCache(object):
+    """
+    以 (棋盘字符串, 执棋方[, 落子]) 为键的 LRU 缓存
+    """
+
+    def __init__(self, max_size=1 << 16):
+        """
+        :param max_size: 最多保存的条目数
+        """
+
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, compute):
+        """
+        查询缓存，未命中时调用 compute() 计算并保存
+        :param key: 可哈希的键
+        :param compute: 无参数函数
+        :return: 缓存的值
+        """
+
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        value = compute()
+        entries[key] = value
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+        return value
+
+    def legal_actions(self, board, color):
+        """
+        同 list(board.get_legal_actions(color))
+        :return: 合法落子列表，顺序与 get_legal_actions 一致；每次返回新的列表，调用方可以修改
+        """
+
+        return list(self.lookup((board.to_string(), color), lambda: tuple(board.get_legal_actions(color))))
+
+    def flips(self, board, action, color):
+        """
+        同 board._can_fliped(action, color)
+        :return: 翻转棋子的坐标列表，落子不合法时返回 False
+        """
+
+        if not isinstance(action, str):
+            action = board.num_board(action)
+        fliped = self.lookup((board.to_string(), color, action),
+                             lambda: tuple(board._can_fliped(action, color) or ()))
+        return list(fliped) or False
+
+    def move(self, board, action, color):
+        """
+        同 board._move(action, color)，翻转棋子取自缓存
+        :return: 翻转棋子的坐标列表，落子失败返回 False
+        """
+
+        if not isinstance(action, str):
+            action = board.num_board(action)
+        fliped = self.flips(board, action, color)
+        if fliped:
+            for flip in fliped:
+                x, y = board.board_num(flip)
+                board[x][y] = color
+            x, y = board.board_num(action)
+            board[x][y] = color
+        return fliped
+
+    def result(self, board):
+        """
+        终局结果
+        :return: 双方都无子可下时返回 board.get_winner()，否则返回 None
+        """
+
+        def compute():
+            if self.legal_actions(board, 'X') or self.legal_actions(board, 'O'):
+                return None
+            return board.get_winner()
+
+        return self.lookup((board.to_string(),), compute)
+
+    def game_over(self, board):
+        """
+        :return: True/False 游戏结束/游戏没有结束
+        """
+
+        return self.result(board) is not None
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """
+        :return: {'size', 'hits', 'misses', 'hit_rate'}
+        """
+
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate}
+
+    def __len__(self):
+        return len(self.entries)
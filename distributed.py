@@ -0,0 +1,366 @@
+"""
+分布式对局与自我对弈：协调者持有全部任务，工作者（可在其他机器上）通过 TCP 连接领取任务，
+用现有的选手完成后把结果发回。连接断开的工作者手中的任务会重新分配，超时未完成的任务也会再次分配，
+每个任务只接受最近一次分配的结果，超时前那次分配迟到的结果会被丢弃；工作者断线后自动重连。任务出错时工作者把错误发回协调者，
+同一任务出错达到次数上限后不再分配，全部任务结束后协调者抛出 RuntimeError。
+协调者默认只监听本机，且没有任何认证，只应在可信的网络中监听其他地址。
+
+消息均为一行 JSON：
+    工作者 -> 协调者  {"type": "hello", "name": "..."}
+                      {"type": "result", "id": 3, "result": {...}}
+                      {"type": "error", "id": 3, "error": "..."}
+    协调者 -> 工作者  {"type": "job", "job": {"id": 3, "kind": "match", ...}}
+                      {"type": "done"}
+
+    python distributed.py worker --host 10.0.0.1 --port 7800
+    python distributed.py tournament "ai:max_playouts=400" roxanne --games 20 --host 0.0.0.0 --port 7800 --local 2
+    python distributed.py selfplay data --games 100 --port 7800 --local 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+from collections import deque
+from time import monotonic, sleep
+
+from record import GameRecord, RecordWriter
+from tournament import PLAYERS, Record, init_worker, parse_spec, play_game_record, report, schedule, tally
+
+
+def _match_job(job):
+    record = play_game_record(job['black'], job['white'], job['seed'])
+    return {'black': record.black, 'white': record.white, 'moves': list(record.moves), 'winner': record.winner,
+            'diff': record.diff, 'black_ms': record.black_ms, 'white_ms': record.white_ms}
+
+
+def _selfplay_job(job):
+    # 只有自我对弈需要 numpy
+    from selfplay import play_game
+
+    data = play_game(job['kwargs'], random.Random(job['seed']))
+    return {name: array.tolist() for name, array in data.items()}
+
+
+# 任务类型 -> 在工作者中执行的函数 fn(job)，返回可序列化为 JSON 的结果
+JOBS = {
+    'match': _match_job,
+    'selfplay': _selfplay_job,
+}
+
+
+def send(f, message):
+    f.write(json.dumps(message) + '\n')
+    f.flush()
+
+
+def worker(host='127.0.0.1', port=7800, name=None, retry_delay=1.0, max_retries=30):
+    """
+    工作者：连接协调者，循环领取并执行任务，断线后重连
+    :param name: 工作者名字，None 表示 主机名:进程号
+    :param retry_delay: 重连间隔（秒）
+    :param max_retries: 连续连接失败多少次后放弃
+    :return: 完成的任务数
+    """
+
+    name = name or '{}:{}'.format(socket.gethostname(), os.getpid())
+    done = 0
+    failures = 0
+    while True:
+        try:
+            with socket.create_connection((host, port)) as sock, sock.makefile('rw', encoding='utf-8') as f:
+                failures = 0
+                send(f, {'type': 'hello', 'name': name})
+                for line in f:
+                    message = json.loads(line)
+                    if message['type'] == 'done':
+                        return done
+                    job = message['job']
+                    try:
+                        result = JOBS[job['kind']](job)
+                    except Exception as e:
+                        # 任务本身出错，交给协调者决定是否重试，工作者继续领取任务
+                        send(f, {'type': 'error', 'id': job['id'], 'error': '{}: {}'.format(type(e).__name__, e)})
+                        continue
+                    send(f, {'type': 'result', 'id': job['id'], 'result': result})
+                    done += 1
+        except OSError:
+            failures += 1
+            if failures > max_retries:
+                return done
+        sleep(retry_delay)
+
+
+class Coordinator(object):
+    """
+    协调者：分配任务、回收断线工作者的任务，结果到达时调用回调
+    """
+
+    def __init__(self, jobs, callback=None, job_timeout=None, poll=0.2, max_failures=3):
+        """
+        :param jobs: 任务字典列表，每个任务需有 kind 字段，id 由协调者分配
+        :param callback: 每个任务首次得到结果时调用 callback(任务, 结果)
+        :param job_timeout: 任务首次分配后多少秒未完成即再次分配，之后每次分配时限加倍；None 表示只在断线时重新分配
+        :param poll: 没有可分配的任务时，检查超时与完成状态的间隔（秒）
+        :param max_failures: 同一任务在工作者中出错多少次后放弃
+        """
+
+        self.jobs = {i: dict(job, id=i) for i, job in enumerate(jobs)}
+        self.pending = deque(self.jobs)
+        self.running = {}  # 任务编号 -> 分配时间
+        self.attempts = {}  # 任务编号 -> 最近一次分配的序号，只接受这一次分配的结果
+        self.finished = set()
+        self.callback = callback
+        self.job_timeout = job_timeout
+        self.poll = poll
+        self.max_failures = max_failures
+        self.failures = {}  # 任务编号 -> 出错次数
+        self.failed = {}  # 放弃的任务编号 -> 最后一次的错误信息
+        self.workers = set()
+        self.all_done = None
+
+    def requeue(self, job_id, attempt):
+        """
+        把任务放回队列；attempt 不是最近一次分配时说明任务已重新分配，忽略
+        """
+
+        if attempt == self.attempts.get(job_id) and job_id not in self.finished and job_id in self.running:
+            del self.running[job_id]
+            self.pending.appendleft(job_id)
+
+    async def next_job(self):
+        """
+        取出下一个待分配的任务
+        :return: 任务编号；全部任务完成时返回 None
+        """
+
+        while True:
+            if self.job_timeout is not None:
+                now = monotonic()
+                for job_id, started in list(self.running.items()):
+                    # 迟到的结果会被丢弃，每次重新分配把时限加倍，耗时超过 job_timeout 的任务最终也能完成
+                    if now - started > self.job_timeout * 2 ** (self.attempts[job_id] - 1):
+                        self.requeue(job_id, self.attempts[job_id])
+            while self.pending:
+                job_id = self.pending.popleft()
+                if job_id not in self.finished:
+                    self.running[job_id] = monotonic()
+                    self.attempts[job_id] = self.attempts.get(job_id, 0) + 1
+                    return job_id
+            if len(self.finished) == len(self.jobs):
+                return None
+            await asyncio.sleep(self.poll)
+
+    def complete(self, job_id, attempt, result):
+        if job_id in self.finished or attempt != self.attempts.get(job_id):
+            # 超时后已重新分配，迟到的结果不再计入
+            return
+        self.finished.add(job_id)
+        self.running.pop(job_id, None)
+        if self.callback is not None:
+            self.callback(self.jobs[job_id], result)
+        if len(self.finished) == len(self.jobs):
+            self.all_done.set()
+
+    def fail(self, job_id, attempt, error):
+        """
+        任务在工作者中出错：未达次数上限时重新分配，否则放弃该任务
+        """
+
+        if job_id in self.finished or attempt != self.attempts.get(job_id):
+            return
+        self.failures[job_id] = self.failures.get(job_id, 0) + 1
+        if self.failures[job_id] < self.max_failures:
+            self.requeue(job_id, attempt)
+            return
+        self.failed[job_id] = error
+        self.finished.add(job_id)
+        self.running.pop(job_id, None)
+        if len(self.finished) == len(self.jobs):
+            self.all_done.set()
+
+    async def handle(self, reader, writer):
+        """
+        服务一个工作者，连接断开时把它手中的任务放回队列
+        """
+
+        job_id = attempt = None
+        try:
+            hello = json.loads(await reader.readline())
+            self.workers.add(hello.get('name'))
+            while True:
+                job_id = await self.next_job()
+                if job_id is None:
+                    writer.write(b'{"type": "done"}\n')
+                    await writer.drain()
+                    break
+                attempt = self.attempts[job_id]
+                writer.write((json.dumps({'type': 'job', 'job': self.jobs[job_id]}) + '\n').encode('utf-8'))
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message['id'] != job_id:
+                    raise ValueError('结果与分配的任务不符')
+                if message['type'] == 'error':
+                    self.fail(job_id, attempt, message['error'])
+                else:
+                    self.complete(job_id, attempt, message['result'])
+                job_id = None
+        except (ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            if job_id is not None:
+                self.requeue(job_id, attempt)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=7800):
+        """
+        监听并等待全部任务完成
+        """
+
+        self.all_done = asyncio.Event()
+        if not self.jobs:
+            return
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await self.all_done.wait()
+            # 给空闲的工作者留出收到 done 的时间
+            await asyncio.sleep(2 * self.poll)
+
+    @staticmethod
+    def local_worker(players, port):
+        # 本机工作者也可能以 spawn 方式启动，需要带上主进程注册的选手类型
+        init_worker(players)
+        worker('127.0.0.1', port)
+
+    def run(self, host='127.0.0.1', port=7800, local_workers=0):
+        """
+        运行协调者，可同时在本机启动若干工作者进程
+        :param host: 监听地址，远程工作者需要连接时设为 '0.0.0.0' 等
+        :param local_workers: 本机工作者进程数
+        :raise RuntimeError: 有任务出错次数达到上限
+        """
+
+        processes = []
+        for _ in range(local_workers):
+            process = multiprocessing.Process(target=Coordinator.local_worker, args=(PLAYERS, port), daemon=True)
+            process.start()
+            processes.append(process)
+        try:
+            asyncio.run(self.serve(host, port))
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+        if self.failed:
+            job_id, error = next(iter(self.failed.items()))
+            raise RuntimeError('{} 个任务失败，任务 {}：{}'.format(len(self.failed), job_id, error))
+
+
+def run_tournament(specs, games, mode='round-robin', seed=None, host='127.0.0.1', port=7800, local_workers=0,
+                   job_timeout=None, recorder=None, callback=None):
+    """
+    分布式对局赛，参数与返回值同 tournament.run()
+    :param local_workers: 本机工作者进程数，0 表示只等待远程工作者
+    :param job_timeout: 见 Coordinator
+    """
+
+    rng = random.Random(seed)
+    jobs = [{'kind': 'match', 'black': specs[black], 'white': specs[white], 'pair': [black, white],
+             'seed': rng.randrange(2 ** 32)} for black, white in schedule(specs, games, mode)]
+    players = [Record() for _ in specs]
+    pairs = {}
+
+    def collect(job, result):
+        if recorder is not None:
+            recorder.write(GameRecord(result['black'], result['white'], bytes(result['moves']), result['winner'],
+                                      result['diff'], result['black_ms'], result['white_ms']))
+        black, white = job['pair']
+        tally(players, pairs, black, white, result['diff'])
+        if callback is not None:
+            callback(black, white, result['diff'])
+
+    Coordinator(jobs, collect, job_timeout).run(host, port, local_workers)
+    return players, pairs
+
+
+def run_selfplay(directory, games, kwargs=None, shard_size=100000, seed=None, host='127.0.0.1', port=7800,
+                 local_workers=0, job_timeout=None, callback=None):
+    """
+    分布式自我对弈，数据格式同 selfplay.generate()
+    :return: 写入的局面数
+    """
+
+    # 只有自我对弈需要 numpy
+    import numpy as np
+    from selfplay import ShardWriter
+
+    if kwargs is None:
+        kwargs = {'time_limit': None, 'max_playouts': 200}
+    rng = random.Random(seed)
+    jobs = [{'kind': 'selfplay', 'kwargs': kwargs, 'seed': rng.randrange(2 ** 32)} for _ in range(games)]
+    done = 0
+    with ShardWriter(directory, shard_size) as writer:
+
+        def collect(job, result):
+            nonlocal done
+            writer.add({name: np.array(result[name], dtype=dtype) for name, (_, dtype) in ShardWriter.FIELDS.items()})
+            done += 1
+            if callback is not None:
+                callback(done, writer.total)
+
+        Coordinator(jobs, collect, job_timeout).run(host, port, local_workers)
+    return writer.total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='分布式对局与自我对弈')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='协调者监听地址（没有认证，接受远程工作者时才设为 0.0.0.0），或工作者要连接的协调者地址')
+    parser.add_argument('--port', type=int, default=7800)
+    parser.add_argument('--local', type=int, default=0, help='协调者在本机启动的工作者进程数')
+    parser.add_argument('--job-timeout', type=float, default=None, help='任务多少秒未完成即再次分配')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    worker_parser = commands.add_parser('worker', help='作为工作者连接协调者')
+    worker_parser.add_argument('--name', default=None, help='工作者名字')
+
+    tournament_parser = commands.add_parser('tournament', help='作为协调者进行对局赛')
+    tournament_parser.add_argument('players', nargs='+', help='选手描述')
+    tournament_parser.add_argument('--games', type=int, default=10, help='每对选手的对局数')
+    tournament_parser.add_argument('--mode', choices=['round-robin', 'gauntlet'], default='round-robin')
+    tournament_parser.add_argument('--record', default=None, help='把全部对局追加写入该棋谱文件')
+
+    selfplay_parser = commands.add_parser('selfplay', help='作为协调者生成自我对弈数据')
+    selfplay_parser.add_argument('directory', help='输出目录')
+    selfplay_parser.add_argument('--games', type=int, default=100, help='对局总数')
+    selfplay_parser.add_argument('--player', default='ai:time_limit=None,max_playouts=200', help='AIPlayer 描述')
+    selfplay_parser.add_argument('--shard-size', type=int, default=100000, help='每个分片的局面数')
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        host = '127.0.0.1' if args.host == '0.0.0.0' else args.host
+        print('完成 {} 个任务'.format(worker(host, args.port, args.name)))
+    elif args.command == 'tournament':
+        for player_spec in args.players:
+            parse_spec(player_spec)
+        writer = RecordWriter(args.record) if args.record else None
+        try:
+            players, pairs = run_tournament(args.players, args.games, args.mode, args.seed, args.host, args.port,
+                                            args.local, args.job_timeout, writer)
+        finally:
+            if writer is not None:
+                writer.close()
+        report(args.players, players, pairs)
+    else:
+        _, kind, player_kwargs = parse_spec(args.player)
+        if kind != 'ai':
+            parser.error('自我对弈只支持 ai 选手')
+        total = run_selfplay(args.directory, args.games, player_kwargs, args.shard_size, args.seed, args.host,
+                             args.port, args.local, args.job_timeout,
+                             callback=lambda g, n: print('\r已完成 {} 局，{} 个局面'.format(g, n), end=''))
+        print()
@@ -0,0 +1,51 @@
+from math import exp
+
+from board import oppo
+from stability import stable_discs
+
+
+# 四个角
+CORNERS = [(0, 0), (0, 7), (7, 0), (7, 7)]
+
+
+def evaluate(board, color):
+    """
+    静态估值：综合角、行动力和稳定子
+    :param board: 棋盘
+    :param color: 执棋方
+    :return: color 一方的局面得分，正数表示 color 占优
+    """
+
+    op_color = oppo(color)
+
+    corner = 0
+    for x, y in CORNERS:
+        if board[x][y] == color:
+            corner += 1
+        elif board[x][y] == op_color:
+            corner -= 1
+
+    my_moves = len(list(board.get_legal_actions(color)))
+    op_moves = len(list(board.get_legal_actions(op_color)))
+    mobility = 0
+    if my_moves + op_moves > 0:
+        mobility = (my_moves - op_moves) / (my_moves + op_moves)
+
+    black, white = stable_discs(board)
+    stable = bin(black).count('1') - bin(white).count('1')
+    if color == 'O':
+        stable = -stable
+
+    return 25 * corner + 20 * mobility + 5 * stable
+
+
+def win_probability(board, color, scale=20):
+    """
+    把静态估值换算为胜率
+    :param board: 棋盘
+    :param color: 执棋方
+    :param scale: 估值缩放系数，越大胜率越接近 0.5
+    :return: color 一方的胜率，取值 (0,1)
+    """
+
+    return 1 / (1 + exp(-evaluate(board, color) / scale))
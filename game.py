@@ -2,11 +2,21 @@ from func_timeout import func_timeout, FunctionTimedOut
 import datetime
 from board import Board
 from copy import deepcopy
+from record import GameRecord, SQUARES, UNKNOWN
 
 
 class Game(object):
-    def __init__(self, black_player, white_player):
+    def __init__(self, black_player, white_player, recorder=None, cache=None):
+        """
+        :param recorder: 棋谱写入器（record.RecordWriter），None 表示不记录棋谱
+        :param cache: 局面缓存（cache.PositionCache），可与选手共享，None 表示不缓存
+        """
         self.board = Board()  # 棋盘
+        self.recorder = recorder
+        self.cache = cache
+        # 本局落子序列和双方用时（毫秒），用于记录棋谱
+        self.moves = bytearray()
+        self.think_ms = {"X": 0, "O": 0}
         # 定义棋盘上当前下棋棋手，先默认是 None
         self.current_player = None
         self.black_player = black_player  # 黑棋一方
@@ -94,7 +104,7 @@ class Game(object):
             # 判断当前下棋方
             color = "X" if self.current_player == self.black_player else "O"
             # 获取当前下棋方合法落子位置
-            legal_actions = list(self.board.get_legal_actions(color))
+            legal_actions = self.legal_actions(color)
             # print("%s合法落子坐标列表："%color,legal_actions)
             if len(legal_actions) == 0:
                 # 判断游戏是否结束
@@ -151,6 +161,7 @@ class Game(object):
             else:
                 # 统计一步所用的时间
                 es_time = (end_time - start_time).seconds
+                self.think_ms[color] += (end_time - start_time).total_seconds() * 1000
                 if es_time > 60:
                     # 该步超过60秒则结束比赛。
                     print('\n{} 思考超过 60s'.format(self.current_player))
@@ -158,7 +169,11 @@ class Game(object):
                     break
 
                 # 当前玩家颜色，更新棋局
-                self.board._move(action, color)
+                if self.cache is None:
+                    self.board._move(action, color)
+                else:
+                    self.cache.move(self.board, action, color)
+                self.moves.append(SQUARES[action])
                 # 统计每种棋子下棋所用总时间
                 if self.current_player == self.black_player:
                     # 当前选手是黑棋一方
@@ -176,22 +191,44 @@ class Game(object):
                     winner, diff = self.board.get_winner()  # 得到赢家 0,1,2
                     break
 
+        # 停止选手的后台搜索（见 AIPlayer.close）
+        for player in (self.black_player, self.white_player):
+            if hasattr(player, 'close'):
+                player.close()
+
         print('\n=====游戏结束!=====\n')
         self.board.display(step_time, total_time)
         self.print_winner(winner)
 
+        if self.recorder is not None:
+            self.recorder.write(GameRecord(type(self.black_player).__name__, type(self.white_player).__name__,
+                                           self.moves, UNKNOWN if winner is None else winner,
+                                           [diff, -diff, 0][winner] if winner is not None else 0,
+                                           self.think_ms["X"], self.think_ms["O"]))
+
         # 返回'black_win','white_win','draw',棋子数差
         if winner is not None and diff > -1:
             result = {0: 'black_win', 1: 'white_win', 2: 'draw'}[winner]
 
             # return result,diff
 
+    def legal_actions(self, color):
+        """
+        :return: color 一方的合法落子列表
+        """
+
+        if self.cache is None:
+            return list(self.board.get_legal_actions(color))
+        return self.cache.legal_actions(self.board, color)
+
     def game_over(self):
         """
         判断游戏是否结束
         :return: True/False 游戏结束/游戏没有结束
         """
 
+        if self.cache is not None:
+            return self.cache.game_over(self.board)
         # 根据当前棋盘，判断棋局是否终止
         # 如果当前选手没有合法下棋的位子，则切换选手；如果另外一个选手也没有合法的下棋位置，则比赛停止。
         b_list = list(self.board.get_legal_actions('X'))
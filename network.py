@@ -0,0 +1,119 @@
+"""
+叶节点批量估值：AIPlayer 在搜索中收集一批待估值的叶节点，一次性交给估值器。
+估值器只需提供 evaluate_batch(positions) 方法，positions 为 [(棋盘, 执棋方), ...]，
+返回 [(执棋方胜率, {落子: 概率}), ...]。这里给出只依赖 NumPy 的参考实现。
+"""
+import numpy as np
+
+from pattern import encode as encode_cells
+
+N_FEATURES = 3 * 64
+
+COORDS = [chr(ord('A') + j) + str(i + 1) for i in range(8) for j in range(8)]
+
+
+def encode(board, color):
+    """
+    把棋盘编码为特征向量：己方棋子、对方棋子、己方合法落子三个 8*8 平面
+    :param board: 棋盘
+    :param color: 执棋方
+    :return: 长度 192 的 float32 数组
+    """
+
+    cells = encode_cells(board, color)
+    features = np.zeros(N_FEATURES, dtype=np.float32)
+    features[:64] = cells == 1
+    features[64:128] = cells == 2
+    for move in board.get_legal_actions(color):
+        x, y = board.board_num(move)
+        features[128 + x * 8 + y] = 1
+    return features
+
+
+def encode_batch(positions):
+    """
+    批量编码
+    :param positions: [(棋盘, 执棋方), ...]
+    :return: (N, 192) 的 float32 数组
+    """
+
+    features = np.zeros((len(positions), N_FEATURES), dtype=np.float32)
+    for i, (board, color) in enumerate(positions):
+        features[i] = encode(board, color)
+    return features
+
+
+class MLPEvaluator(object):
+    """
+    单隐层 MLP 价值/策略网络：价值头输出执棋方胜率，策略头输出 64 个格子的落子概率
+    """
+
+    def __init__(self, hidden=128, path=None, seed=None):
+        """
+        初始化网络
+        :param hidden: 隐层宽度
+        :param path: 权重文件路径（np.savez 格式），None 表示随机初始化
+        :param seed: 随机初始化的种子
+        """
+
+        rng = np.random.default_rng(seed)
+        self.w1 = (rng.standard_normal((N_FEATURES, hidden)) / np.sqrt(N_FEATURES)).astype(np.float32)
+        self.b1 = np.zeros(hidden, dtype=np.float32)
+        self.wv = (rng.standard_normal((hidden, 1)) / np.sqrt(hidden)).astype(np.float32)
+        self.bv = np.zeros(1, dtype=np.float32)
+        self.wp = (rng.standard_normal((hidden, 64)) / np.sqrt(hidden)).astype(np.float32)
+        self.bp = np.zeros(64, dtype=np.float32)
+        if path is not None:
+            self.load(path)
+
+    def load(self, path):
+        """
+        从文件载入权重
+        :param path: 权重文件路径
+        """
+
+        data = np.load(path)
+        for name in ('w1', 'b1', 'wv', 'bv', 'wp', 'bp'):
+            setattr(self, name, data[name].astype(np.float32))
+
+    def save(self, path):
+        """
+        保存权重
+        :param path: 权重文件路径
+        """
+
+        np.savez(path, w1=self.w1, b1=self.b1, wv=self.wv, bv=self.bv, wp=self.wp, bp=self.bp)
+
+    def forward(self, features):
+        """
+        前向计算
+        :param features: (N, 192) 的特征
+        :return: (胜率 (N,), 落子概率 (N, 64))，非法落子的概率为 0
+        """
+
+        h = np.maximum(features @ self.w1 + self.b1, 0)
+        value = 1 / (1 + np.exp(-(h @ self.wv + self.bv)[:, 0]))
+        logits = h @ self.wp + self.bp
+        legal = features[:, 128:] > 0
+        logits = np.where(legal, logits, -np.inf)
+        logits -= np.max(np.where(legal, logits, 0), axis=1, keepdims=True)
+        policy = np.where(legal, np.exp(logits), 0)
+        total = policy.sum(axis=1, keepdims=True)
+        policy = np.divide(policy, total, out=np.zeros_like(policy), where=total > 0)
+        return value, policy
+
+    def evaluate_batch(self, positions):
+        """
+        批量估值
+        :param positions: [(棋盘, 执棋方), ...]
+        :return: [(执棋方胜率, {落子: 概率}), ...]
+        """
+
+        if len(positions) == 0:
+            return []
+        value, policy = self.forward(encode_batch(positions))
+        result = []
+        for i in range(len(positions)):
+            moves = {COORDS[k]: float(policy[i, k]) for k in np.flatnonzero(policy[i])}
+            result.append((float(value[i]), moves))
+        return result
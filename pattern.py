@@ -0,0 +1,289 @@
+"""
+Logistello 式模式估值：把棋盘上的边、角、对角线等局部形状编码为三进制下标，
+按对局阶段查表求和，得到执棋方的终局棋子差估计。权重由离线训练器根据自我对弈的终局结果拟合。
+"""
+import argparse
+import random
+from math import exp
+
+import numpy as np
+
+from board import Board, oppo
+
+
+# 以左上角为基准的模式，坐标为 (行, 列)，其余实例由 8 种对称变换生成
+BASE_PATTERNS = {
+    'edge2x': [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7), (1, 1), (1, 6)],
+    'corner3x3': [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)],
+    'corner2x5': [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0), (1, 1), (1, 2), (1, 3), (1, 4)],
+    'hv2': [(1, j) for j in range(8)],
+    'hv3': [(2, j) for j in range(8)],
+    'hv4': [(3, j) for j in range(8)],
+    'diag8': [(i, i) for i in range(8)],
+    'diag7': [(i, i + 1) for i in range(7)],
+    'diag6': [(i, i + 2) for i in range(6)],
+    'diag5': [(i, i + 3) for i in range(5)],
+    'diag4': [(i, i + 4) for i in range(4)],
+}
+
+# 8 种对称变换：恒等、旋转、镜像及其组合
+SYMMETRIES = [
+    lambda i, j: (i, j),
+    lambda i, j: (j, 7 - i),
+    lambda i, j: (7 - i, 7 - j),
+    lambda i, j: (7 - j, i),
+    lambda i, j: (i, 7 - j),
+    lambda i, j: (7 - i, j),
+    lambda i, j: (j, i),
+    lambda i, j: (7 - j, 7 - i),
+]
+
+N_PHASES = 15
+
+
+def pattern_instances(squares):
+    """
+    生成一个模式在 8 种对称变换下的所有不同实例
+    :param squares: 基准模式的坐标列表
+    :return: 二维数组，每行是一个实例在 0-63 格上的编号，顺序与基准模式一一对应
+    """
+
+    seen = set()
+    instances = []
+    for sym in SYMMETRIES:
+        cells = [sym(i, j) for i, j in squares]
+        key = frozenset(cells)
+        if key in seen:
+            continue
+        seen.add(key)
+        instances.append([i * 8 + j for i, j in cells])
+    return np.array(instances, dtype=np.intp)
+
+
+PATTERNS = {name: pattern_instances(squares) for name, squares in BASE_PATTERNS.items()}
+POWERS = {name: 3 ** np.arange(len(squares), dtype=np.intp) for name, squares in BASE_PATTERNS.items()}
+
+# 字符到三进制取值的查找表：空 0，执棋方 1，对手 2
+_LOOKUP = {}
+for _color in ('X', 'O'):
+    _table = np.zeros(256, dtype=np.int8)
+    _table[ord(_color)] = 1
+    _table[ord(oppo(_color))] = 2
+    _LOOKUP[_color] = _table
+
+
+def encode(board, color):
+    """
+    把棋盘编码为长度 64 的数组
+    :param board: 棋盘
+    :param color: 执棋方
+    :return: int8 数组，空 0，执棋方 1，对手 2
+    """
+
+    cells = ''.join(''.join(row) for row in board._board).encode('ascii')
+    return _LOOKUP[color][np.frombuffer(cells, dtype=np.uint8)]
+
+
+def phase_of(cells):
+    """
+    根据盘面棋子数计算对局阶段
+    :param cells: encode() 得到的数组
+    :return: 阶段编号，0 ~ N_PHASES - 1
+    """
+
+    discs = int(np.count_nonzero(cells))
+    return min(N_PHASES - 1, (discs - 4) * N_PHASES // 61)
+
+
+def indices(cells):
+    """
+    计算所有模式实例的三进制下标
+    :param cells: encode() 得到的数组，或者形如 (N, 64) 的批量数组
+    :return: {模式名: 下标数组}
+    """
+
+    cells = cells.astype(np.intp)
+    return {name: cells[..., PATTERNS[name]] @ POWERS[name] for name in PATTERNS}
+
+
+class PatternEvaluator(object):
+    """
+    模式估值器，权重表为 {模式名: (N_PHASES, 3 ** 长度) 的 float32 数组}
+    """
+
+    def __init__(self, path=None):
+        """
+        初始化估值器
+        :param path: 权重文件路径（np.savez 格式），None 表示全零权重
+        """
+
+        self.weights = {name: np.zeros((N_PHASES, 3 ** len(squares)), dtype=np.float32)
+                        for name, squares in BASE_PATTERNS.items()}
+        self.bias = np.zeros(N_PHASES, dtype=np.float32)
+        if path is not None:
+            self.load(path)
+
+    def load(self, path):
+        """
+        从文件载入权重
+        :param path: 权重文件路径
+        """
+
+        data = np.load(path)
+        for name in self.weights:
+            self.weights[name] = data[name].astype(np.float32)
+        self.bias = data['bias'].astype(np.float32)
+
+    def save(self, path):
+        """
+        保存权重
+        :param path: 权重文件路径
+        """
+
+        np.savez_compressed(path, bias=self.bias, **self.weights)
+
+    def evaluate_cells(self, cells):
+        """
+        对编码后的盘面估值
+        :param cells: encode() 得到的数组
+        :return: 执棋方的终局棋子差估计
+        """
+
+        phase = phase_of(cells)
+        score = float(self.bias[phase])
+        for name, idx in indices(cells).items():
+            score += float(self.weights[name][phase, idx].sum())
+        return score
+
+    def evaluate(self, board, color):
+        """
+        模式估值
+        :param board: 棋盘
+        :param color: 执棋方
+        :return: color 一方的终局棋子差估计，正数表示 color 占优
+        """
+
+        return self.evaluate_cells(encode(board, color))
+
+    def win_probability(self, board, color, scale=10):
+        """
+        把模式估值换算为胜率
+        :param scale: 估值缩放系数，越大胜率越接近 0.5
+        :return: color 一方的胜率，取值 (0,1)
+        """
+
+        return 1 / (1 + exp(-self.evaluate(board, color) / scale))
+
+    def train(self, cells, targets, epochs=10, lr=0.5, batch_size=256, seed=None):
+        """
+        用随机梯度下降拟合权重，最小化估值与终局棋子差的均方误差
+        :param cells: (N, 64) 的编码盘面，均以执棋方为视角
+        :param targets: 长度 N 的终局棋子差，以执棋方为视角
+        :param epochs: 训练轮数
+        :param lr: 学习率
+        :param batch_size: 每批样本数
+        :param seed: 打乱样本用的随机种子
+        :return: 每一轮的均方误差
+        """
+
+        rng = np.random.default_rng(seed)
+        targets = np.asarray(targets, dtype=np.float32)
+        phases = np.minimum(N_PHASES - 1, (np.count_nonzero(cells, axis=1) - 4) * N_PHASES // 61)
+        idx = indices(cells)
+        # 每个样本同时激活 n_features 个权重，学习率按此归一化，使一步更新后估值约修正 lr 倍的误差
+        n_features = 1 + sum(PATTERNS[name].shape[0] for name in PATTERNS)
+        lr = lr / n_features
+        history = []
+        for _ in range(epochs):
+            order = rng.permutation(len(targets))
+            total = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                phase = phases[batch]
+                pred = self.bias[phase].copy()
+                for name in self.weights:
+                    pred += self.weights[name][phase[:, None], idx[name][batch]].sum(axis=1)
+                err = targets[batch] - pred
+                total += float((err ** 2).sum())
+                # 同一权重在一批中出现多次时取平均梯度，避免常见形状的权重步长过大
+                self._update(self.bias[:, None], phase, np.zeros_like(phase), err, lr)
+                for name, table in self.weights.items():
+                    width = idx[name].shape[1]
+                    self._update(table, np.repeat(phase, width), idx[name][batch].ravel(),
+                                 np.repeat(err, width), lr)
+            history.append(total / max(len(order), 1))
+        return history
+
+    def _update(self, table, rows, cols, err, lr):
+        """
+        按权重出现次数平均后更新权重表
+        """
+
+        flat = rows * table.shape[1] + cols
+        unique, inverse = np.unique(flat, return_inverse=True)
+        grad = np.bincount(inverse, weights=err) / np.bincount(inverse)
+        table.flat[unique] += (lr * grad).astype(np.float32)
+
+
+def selfplay(games, epsilon=0.1, seed=None):
+    """
+    用 Roxanne 策略自我对弈生成训练样本，以 epsilon 的概率随机落子以增加样本多样性
+    :param games: 对局数
+    :param epsilon: 随机落子概率
+    :param seed: 随机种子
+    :return: (cells, targets)，每个局面按双方视角各记录一次
+    """
+
+    from AIPlayer import RoxannePlayer
+
+    rng = random.Random(seed)
+    # 选手共用同一个随机数生成器，相同的种子得到相同的样本
+    players = {'X': RoxannePlayer('X', rng), 'O': RoxannePlayer('O', rng)}
+    cells, colors, game_ids, results = [], [], [], []
+    for g in range(games):
+        board = Board()
+        color = 'X'
+        while True:
+            legal = list(board.get_legal_actions(color))
+            if len(legal) == 0:
+                color = oppo(color)
+                if len(list(board.get_legal_actions(color))) == 0:
+                    break
+                continue
+            cells.append(encode(board, color))
+            colors.append(color)
+            game_ids.append(g)
+            if rng.random() < epsilon:
+                action = rng.choice(legal)
+            else:
+                action = players[color].get_move(board)
+            board._move(action, color)
+            color = oppo(color)
+        results.append(board.count('X') - board.count('O'))
+
+    cells = np.array(cells, dtype=np.int8)
+    black_diff = np.array(results, dtype=np.float32)[np.array(game_ids, dtype=np.intp)]
+    sign = np.where(np.array(colors) == 'X', 1, -1).astype(np.float32)
+    targets = black_diff * sign
+    # 交换双方棋子得到对手视角的样本
+    swapped = np.where(cells == 0, 0, 3 - cells).astype(np.int8)
+    return np.concatenate([cells, swapped]), np.concatenate([targets, -targets])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='离线训练模式估值权重')
+    parser.add_argument('--games', type=int, default=1000, help='自我对弈局数')
+    parser.add_argument('--epochs', type=int, default=10, help='训练轮数')
+    parser.add_argument('--lr', type=float, default=0.5, help='学习率')
+    parser.add_argument('--epsilon', type=float, default=0.1, help='自我对弈中的随机落子概率')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--init', default=None, help='在已有权重的基础上继续训练')
+    parser.add_argument('--output', default='pattern_weights.npz', help='权重输出路径')
+    args = parser.parse_args()
+
+    samples, outcomes = selfplay(args.games, args.epsilon, args.seed)
+    print('样本数：', len(outcomes))
+    evaluator = PatternEvaluator(args.init)
+    for epoch, mse in enumerate(evaluator.train(samples, outcomes, args.epochs, args.lr, seed=args.seed)):
+        print('第 {} 轮，均方误差 {:.3f}'.format(epoch + 1, mse))
+    evaluator.save(args.output)
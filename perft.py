@@ -0,0 +1,131 @@
+"""
+Perft：从给定局面出发，统计走到第 depth 步时的叶节点数，用来校验走子生成是否正确，同时测量走子生成的速度。
+无子可下时弃权也算一步；双方都无子可下的终局提前成为叶节点。
+
+    python perft.py                 # 校验全部参考局面
+    python perft.py --depth 6       # 从初始局面统计到第 6 步并报告速度
+"""
+import argparse
+import sys
+from time import perf_counter
+
+from board import oppo
+from record import final_position
+
+# 初始局面的公认 perft 结果（弃权计为一步）
+START_COUNTS = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284]
+
+# 参考局面：(名称, 从初始局面开始的落子序列, 深度, 叶节点数)
+# 落子序列中省略弃权，重放时自动补上；叶节点数由本文件中的参考实现计算得到
+REFERENCE_POSITIONS = [
+    ('opening', 'F5 D6 C3 D3 C4', 5, 25039),
+    ('midgame', 'E6 F4 G3 C6 C5 E7 C7 B7 F5 B6 A8 B8 B5 D7 C8 D8 E8 B4 A4 G6', 4, 9118),
+    ('late', 'F5 F6 D3 C3 F7 G5 B2 C5 H4 G7 D6 F8 G6 E7 H8 D2 C2 H5 F4 F3 D7 H6 F2 H3 B6 C7 E2 G4 H7 B4 '
+             'A5 D1 E1 A3 C1 A1 E8 G2 D8 A7', 5, 52108),
+    ('endgame', 'D3 C3 B3 D2 E6 A3 C2 D1 B1 F4 B2 E3 F5 D6 C5 E7 A4 G5 C4 A5 F3 A2 C1 B4 E1 F2 F6 G6 D7 C6 '
+                'G1 F1 B6 B5 F7 C8 H4 B7 H7 G7 F8 H5 G4 E2 C7 H6 A7 G3 A6 A8 B8 A1', 8, 6995),
+]
+
+
+class Counter(object):
+    """
+    统计 perft 过程中各项棋盘操作的次数
+    """
+
+    def __init__(self):
+        self.legal = 0
+        self.move = 0
+        self.undo = 0
+
+
+def perft(board, color, depth, counter=None):
+    """
+    统计叶节点数，搜索结束后棋盘恢复原状
+    :param board: 棋盘
+    :param color: 执棋方
+    :param depth: 深度
+    :param counter: Counter 对象，None 表示不统计操作次数
+    :return: 叶节点数
+    """
+
+    if depth == 0:
+        return 1
+    if counter is not None:
+        counter.legal += 1
+    moves = list(board.get_legal_actions(color))
+    if len(moves) == 0:
+        if counter is not None:
+            counter.legal += 1
+        if len(list(board.get_legal_actions(oppo(color)))) == 0:
+            # 终局
+            return 1
+        # 弃权也算一步
+        return perft(board, oppo(color), depth - 1, counter)
+
+    total = 0
+    for move in moves:
+        flipped = board._move(move, color)
+        total += perft(board, oppo(color), depth - 1, counter)
+        board.backpropagation(move, flipped, color)
+        if counter is not None:
+            counter.move += 1
+            counter.undo += 1
+    return total
+
+
+def benchmark(board, color, depth):
+    """
+    运行 perft 并测量速度
+    :return: {'nodes', 'seconds', 'nps', 'legal_per_second', 'move_per_second'}
+    """
+
+    counter = Counter()
+    start = perf_counter()
+    nodes = perft(board, color, depth, counter)
+    seconds = perf_counter() - start
+    return {
+        'nodes': nodes,
+        'seconds': seconds,
+        'nps': nodes / seconds if seconds > 0 else 0.0,
+        'legal_per_second': counter.legal / seconds if seconds > 0 else 0.0,
+        'move_per_second': (counter.move + counter.undo) / seconds if seconds > 0 else 0.0,
+    }
+
+
+def check(max_start_depth=6, verbose=True):
+    """
+    校验初始局面和全部参考局面的 perft 结果
+    :param max_start_depth: 初始局面校验到的最大深度
+    :param verbose: 是否打印每一项结果
+    :return: True/False 全部正确/存在错误
+    """
+
+    cases = [('start', '', depth, START_COUNTS[depth]) for depth in range(1, max_start_depth + 1)]
+    cases += REFERENCE_POSITIONS
+    ok = True
+    for name, moves, depth, expected in cases:
+        board, color = final_position(moves)
+        result = benchmark(board, color, depth)
+        passed = result['nodes'] == expected
+        ok = ok and passed
+        if verbose:
+            print('{:8} depth {:2}: {:>10} {} {:>10.0f} nodes/s'.format(
+                name, depth, result['nodes'], 'ok' if passed else '!= {}'.format(expected), result['nps']))
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='走子生成的 perft 校验与速度测试')
+    parser.add_argument('--depth', type=int, default=None, help='只从指定局面统计到该深度并报告速度')
+    parser.add_argument('--moves', default='', help='从初始局面开始的落子序列，比如 "F5 D6 C3"')
+    parser.add_argument('--max-start-depth', type=int, default=6, help='校验初始局面的最大深度')
+    args = parser.parse_args()
+
+    if args.depth is None:
+        sys.exit(0 if check(args.max_start_depth) else 1)
+
+    board, color = final_position(args.moves)
+    result = benchmark(board, color, args.depth)
+    print('nodes {nodes}  time {seconds:.3f}s  {nps:.0f} nodes/s  '
+          'get_legal_actions {legal_per_second:.0f}/s  _move+backpropagation {move_per_second:.0f}/s'.format(
+              **result))
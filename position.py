@@ -0,0 +1,322 @@
+"""
+16 字节的局面编码和内存映射的局面库。
+
+编码：黑棋掩码、白棋掩码各 8 字节（大端，字节序与数值序一致，可直接按字节比较和排序），
+执棋方借用 D4 格表示：中心四格从不为空，黑方走时 D4 只在其中一个掩码中置位；
+白方走时 D4 若为黑棋则在两个掩码中都置位，若为白棋则都不置位。
+
+局面库文件：8 字节文件头（魔数 b'RVPS'、版本、标志位、值长度），之后是定长记录（16 字节编码 + 值）。
+追加写入后用 sort_store() 排序去重，再用 PositionStore 以只读 mmap 打开、二分查找，内存占用与记录数无关。
+
+    with PositionWriter('book.pos', value_size=4, canonical=True) as writer:
+        writer.add(board, 'X', struct.pack('<f', score))
+    sort_store('book.pos')
+    with PositionStore('book.pos') as store:
+        value = store.lookup(board, 'X')
+"""
+import argparse
+import mmap
+import os
+import struct
+
+from board import Board
+from symmetry import canonical_bitboards
+
+KEY = struct.Struct('>QQ')
+HEADER = struct.Struct('<4sBBH')
+MAGIC = b'RVPS'
+VERSION = 1
+SORTED = 1
+CANONICAL = 2
+D4 = 1 << 27
+
+
+def encode_bitboards(black, white, color):
+    """
+    :param black: 黑棋掩码
+    :param white: 白棋掩码
+    :param color: 执棋方
+    :return: 16 字节的编码
+    """
+
+    if not (black | white) & D4:
+        raise ValueError('D4 为空的局面无法编码')
+    if color == 'O':
+        if black & D4:
+            white |= D4
+        else:
+            white &= ~D4
+    return KEY.pack(black, white)
+
+
+def decode_bitboards(data):
+    """
+    :param data: 16 字节的编码
+    :return: (黑棋掩码, 白棋掩码, 执棋方)
+    """
+
+    black, white = KEY.unpack(data)
+    both = black & white & D4
+    if both:
+        return black, white & ~D4, 'O'
+    if not (black | white) & D4:
+        return black, white | D4, 'O'
+    return black, white, 'X'
+
+
+def encode(board, color, canonical=False):
+    """
+    编码局面
+    :param canonical: 是否先变换为对称规范形式（见 symmetry.py），对称的局面得到相同的编码
+    :return: 16 字节的编码
+    """
+
+    black, white = board.bitboards()
+    if canonical:
+        black, white, _ = canonical_bitboards(black, white)
+    return encode_bitboards(black, white, color)
+
+
+def decode(data):
+    """
+    :return: (棋盘, 执棋方)
+    """
+
+    black, white, color = decode_bitboards(data)
+    return Board.from_bitboards(black, white), color
+
+
+def read_header(f):
+    magic, version, flags, value_size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('不是局面库文件')
+    return flags, value_size
+
+
+class PositionWriter(object):
+    """
+    向局面库追加记录，追加后局面库标记为未排序
+    """
+
+    def __init__(self, path, value_size=0, canonical=False):
+        """
+        :param path: 局面库路径，已存在时追加
+        :param value_size: 每条记录附带的值的字节数
+        :param canonical: add() 时是否把局面变换为对称规范形式
+        :raise ValueError: 已存在的局面库的值长度或规范化设置与参数不一致
+        """
+
+        self.value_size = value_size
+        self.canonical = canonical
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                flags, existing_size = read_header(f)
+            if existing_size != value_size or bool(flags & CANONICAL) != canonical:
+                raise ValueError('局面库的设置（值长度 {}，规范化 {}）与参数不一致'.format(
+                    existing_size, bool(flags & CANONICAL)))
+            self.file = open(path, 'r+b')
+        else:
+            self.file = open(path, 'w+b')
+        self.flags = CANONICAL if self.canonical else 0
+        self.write_header()
+        self.file.seek(0, os.SEEK_END)
+
+    def write_header(self):
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.flags, self.value_size))
+
+    def append(self, key, value=b''):
+        """
+        追加一条记录
+        :param key: encode() 得到的 16 字节编码
+        :param value: 值，不足 value_size 时以 0 补齐
+        """
+
+        if len(value) > self.value_size:
+            raise ValueError('值超过 {} 字节'.format(self.value_size))
+        self.file.write(key + value.ljust(self.value_size, b'\0'))
+
+    def add(self, board, color, value=b''):
+        """
+        编码并追加一个局面
+        """
+
+        self.append(encode(board, color, self.canonical), value)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def sort_store(path, dedupe=True, chunk=1 << 16):
+    """
+    排序局面库，写入临时文件后替换原文件。
+    记录通过 numpy 结构化数组以 mmap 方式读取，只在内存中排序下标，每条记录约占 8 字节内存
+    :param dedupe: 是否去掉重复的局面，保留最先写入的一条
+    :param chunk: 每次写出的记录数
+    :return: 排序后的记录数
+    """
+
+    # 只有排序需要 numpy
+    import numpy as np
+
+    with open(path, 'rb') as f:
+        flags, value_size = read_header(f)
+    fields = [('black', '>u8'), ('white', '>u8')]
+    if value_size:
+        fields.append(('value', 'V{}'.format(value_size)))
+    dtype = np.dtype(fields)
+    count = max(os.path.getsize(path) - HEADER.size, 0) // dtype.itemsize
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags | SORTED, value_size))
+        if count:
+            records = np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(count,))
+            # lexsort 是稳定排序，相同局面保持写入顺序；大端无符号整数的数值序与字节序一致
+            order = np.lexsort((records['white'], records['black']))
+            if dedupe:
+                black, white = records['black'][order], records['white'][order]
+                keep = np.ones(count, dtype=bool)
+                keep[1:] = (black[1:] != black[:-1]) | (white[1:] != white[:-1])
+                del black, white
+                order = order[keep]
+            for start in range(0, len(order), chunk):
+                f.write(records[order[start:start + chunk]].tobytes())
+            count = len(order)
+            del records
+    os.replace(temp, path)
+    return count
+
+
+class PositionStore(object):
+    """
+    以只读 mmap 打开的局面库
+    """
+
+    def __init__(self, path):
+        """
+        :param path: 局面库路径
+        """
+
+        with open(path, 'rb') as f:
+            flags, self.value_size = read_header(f)
+        self.sorted = bool(flags & SORTED)
+        self.canonical = bool(flags & CANONICAL)
+        self.record_size = KEY.size + self.value_size
+        self.file = open(path, 'rb')
+        size = os.path.getsize(path)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > HEADER.size else b''
+        self.count = max(size - HEADER.size, 0) // self.record_size
+
+    def __len__(self):
+        return self.count
+
+    def key(self, index):
+        offset = HEADER.size + index * self.record_size
+        return self.data[offset:offset + KEY.size]
+
+    def __getitem__(self, index):
+        """
+        :return: (16 字节编码, 值)
+        """
+
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        offset = HEADER.size + index * self.record_size
+        return self.data[offset:offset + KEY.size], self.data[offset + KEY.size:offset + self.record_size]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def find(self, key):
+        """
+        二分查找
+        :param key: 16 字节编码
+        :return: 记录下标，不存在时返回 -1
+        """
+
+        if not self.sorted:
+            raise ValueError('局面库未排序，请先调用 sort_store()')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.key(lo) == key:
+            return lo
+        return -1
+
+    def get(self, key, default=None):
+        """
+        :return: 编码对应的值，不存在时返回 default
+        """
+
+        index = self.find(key)
+        if index < 0:
+            return default
+        return self[index][1]
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def lookup(self, board, color, default=None):
+        """
+        按局面查询，按局面库的设置决定是否先规范化
+        :return: 局面对应的值，不存在时返回 default
+        """
+
+        return self.get(encode(board, color, self.canonical), default)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    from record import read_records, replay
+    from wthor import read_archive
+
+    parser = argparse.ArgumentParser(description='局面库工具')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='把棋谱中的全部局面写入局面库并排序去重')
+    build_parser.add_argument('store', help='局面库路径')
+    build_parser.add_argument('games', nargs='+', help='.rvg 棋谱或 .wtb / .ggf 棋谱库')
+    build_parser.add_argument('--canonical', action='store_true', help='按对称规范形式合并对称局面')
+    sort_parser = commands.add_parser('sort', help='排序去重')
+    sort_parser.add_argument('store', help='局面库路径')
+    info_parser = commands.add_parser('info', help='查看局面库信息')
+    info_parser.add_argument('store', help='局面库路径')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        with PositionWriter(args.store, canonical=args.canonical) as writer:
+            for path in args.games:
+                games = read_records(path) if path.lower().endswith('.rvg') else read_archive(path)
+                for game in games:
+                    try:
+                        for position, side, _ in replay(game):
+                            writer.add(position, side)
+                    except ValueError:
+                        continue
+        print('共 {} 个局面'.format(sort_store(args.store)))
+    elif args.command == 'sort':
+        print('共 {} 个局面'.format(sort_store(args.store)))
+    else:
+        with PositionStore(args.store) as position_store:
+            print('记录数 {}  值长度 {}  已排序 {}  规范化 {}'.format(
+                len(position_store), position_store.value_size, position_store.sorted, position_store.canonical))
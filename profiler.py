@@ -0,0 +1,186 @@
+"""
+可选的性能剖析层：开启时把 Board 和 MCTS 的热点方法替换为计时包装，关闭时恢复原方法，
+因此不开启剖析时热路径上没有任何额外判断。结果可以输出为文本报表，或者导出为 pstats 可读取的文件。
+
+    profiler = Profiler()
+    with profiler:
+        AIPlayer('X').get_move(Board())
+    print(profiler.report())
+    profiler.dump_stats('search.prof')  # python -m pstats search.prof
+"""
+import marshal
+import threading
+from time import perf_counter
+
+import board as board_module
+
+
+def default_targets():
+    """
+    默认剖析的方法列表
+    :return: [(所属对象, 属性名), ...]
+    """
+
+    import AIPlayer as ai_module
+
+    return [
+        (board_module.Board, '_can_fliped'),
+        (board_module.Board, 'get_legal_actions'),
+        (board_module.Board, '_move'),
+        (board_module.Board, 'backpropagation'),
+        (ai_module, 'deepcopy'),
+        (ai_module.AIPlayer, 'select'),
+        (ai_module.AIPlayer, 'expand'),
+        (ai_module.AIPlayer, 'simulate'),
+        (ai_module.AIPlayer, 'back_prop'),
+    ]
+
+
+def function_key(func):
+    """
+    pstats 使用的函数标识 (文件名, 行号, 函数名)
+    """
+
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return '~', 0, getattr(func, '__qualname__', repr(func))
+    return code.co_filename, code.co_firstlineno, func.__qualname__
+
+
+class Profiler(object):
+    """
+    对指定方法统计调用次数、总耗时和自身耗时（扣除被剖析的子调用）
+    """
+
+    def __init__(self, targets=None):
+        """
+        剖析器初始化
+        :param targets: [(所属对象, 属性名), ...]，None 表示 default_targets()
+        """
+
+        self.targets = targets
+        self.originals = []
+        # key -> [调用次数, 非递归调用次数, 自身耗时, 累计耗时, {调用方 key: 次数}]
+        self.stats = {}
+        self.local = threading.local()
+
+    def enable(self):
+        """
+        用计时包装替换目标方法
+        """
+
+        if self.originals:
+            return
+        targets = default_targets() if self.targets is None else self.targets
+        for owner, name in targets:
+            original = vars(owner)[name]
+            self.originals.append((owner, name, original))
+            setattr(owner, name, self.wrap(original, name == 'get_legal_actions'))
+
+    def disable(self):
+        """
+        恢复原方法
+        """
+
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def reset(self):
+        """
+        清空统计，已安装的包装仍然持有各自的统计项，因此原地清零
+        """
+
+        for entry in self.stats.values():
+            entry[:4] = [0, 0, 0.0, 0.0]
+            entry[4].clear()
+
+    def wrap(self, func, is_generator=False):
+        """
+        生成计时包装
+        :param func: 原函数
+        :param is_generator: 原函数是否为生成器；生成器会被立即求值为列表后再返回迭代器，
+               这样耗时才能计入该函数本身
+        """
+
+        key = function_key(func)
+        entry = self.stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+        local = self.local
+
+        def wrapper(*args, **kwargs):
+            stack = getattr(local, 'stack', None)
+            if stack is None:
+                stack = local.stack = []
+            caller = stack[-1][0] if stack else None
+            recursive = any(frame[0] == key for frame in stack)
+            frame = [key, 0.0]
+            stack.append(frame)
+            start = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                if is_generator:
+                    result = iter(list(result))
+                return result
+            finally:
+                elapsed = perf_counter() - start
+                stack.pop()
+                entry[0] += 1
+                entry[2] += elapsed - frame[1]
+                if not recursive:
+                    entry[1] += 1
+                    entry[3] += elapsed
+                if stack:
+                    stack[-1][1] += elapsed
+                if caller is not None:
+                    entry[4][caller] = entry[4].get(caller, 0) + 1
+
+        wrapper.__wrapped__ = func
+        wrapper.__name__ = getattr(func, '__name__', 'wrapper')
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def report(self, sort='cumulative'):
+        """
+        生成文本报表
+        :param sort: 'cumulative' 按累计耗时排序，'tottime' 按自身耗时排序，'calls' 按调用次数排序
+        :return: 报表字符串
+        """
+
+        column = {'calls': 0, 'tottime': 2, 'cumulative': 3}[sort]
+        rows = sorted(self.stats.items(), key=lambda item: -item[1][column])
+        lines = ['{:>10} {:>12} {:>12} {:>12}  {}'.format('calls', 'tottime', 'cumtime', 'per call', 'function')]
+        for (filename, lineno, name), (calls, _, tottime, cumtime, _) in rows:
+            if calls == 0:
+                continue
+            lines.append('{:>10} {:>12.4f} {:>12.4f} {:>12.6f}  {}'.format(calls, tottime, cumtime, cumtime / calls,
+                                                                            name))
+        return '\n'.join(lines)
+
+    def pstats_dict(self):
+        """
+        转换为 pstats 的内部格式 {函数: (非递归调用次数, 调用次数, 自身耗时, 累计耗时, {调用方: (...)})}
+        """
+
+        result = {}
+        for key, (calls, primitive, tottime, cumtime, callers) in self.stats.items():
+            if calls == 0:
+                continue
+            caller_stats = {caller: (count, count, 0.0, 0.0) for caller, count in callers.items()}
+            result[key] = (primitive, calls, tottime, cumtime, caller_stats)
+        return result
+
+    def dump_stats(self, path):
+        """
+        导出为 pstats.Stats(path) 可以直接读取的文件
+        :param path: 文件路径
+        """
+
+        with open(path, 'wb') as f:
+            marshal.dump(self.pstats_dict(), f)
@@ -0,0 +1,230 @@
+"""
+紧凑的二进制棋谱格式。文件以 5 字节的魔数 b'RVGR\\x01' 开头，之后是连续的棋谱记录：
+
+    头部 13 字节（小端）：步数 B，赢家 B（0 黑胜，1 白胜，2 平局，255 未知），黑减白棋子差 b，
+                         黑方名字长度 B，白方名字长度 B，黑方用时毫秒 I，白方用时毫秒 I
+    黑方名字、白方名字（UTF-8）
+    落子，每步 1 字节，取值 行 * 8 + 列；弃权不记录，重放时自动补上
+
+    with RecordWriter('games.rvg') as writer:
+        Game(black, white, recorder=writer).run()
+    for record in read_records('games.rvg'):
+        for board, color, move in replay(record):
+            ...
+"""
+import mmap
+import os
+import struct
+
+from board import Board, oppo
+
+MAGIC = b'RVGR\x01'
+HEADER = struct.Struct('<BBbBBII')
+UNKNOWN = 255
+
+# 棋盘坐标与格子编号的互查表
+SQUARES = {chr(ord('A') + j) + str(i + 1): i * 8 + j for i in range(8) for j in range(8)}
+NAMES = {index: name for name, index in SQUARES.items()}
+
+
+def truncate_name(name, limit=255):
+    """
+    把名字编码为 UTF-8，超过 limit 字节时在字符边界处截断，避免截出半个汉字
+    :return: bytes
+    """
+
+    data = name.encode('utf-8')
+    if len(data) <= limit:
+        return data
+    return data[:limit].decode('utf-8', 'ignore').encode('utf-8')
+
+
+class GameRecord(object):
+    """
+    一局棋谱
+    """
+
+    def __init__(self, black='', white='', moves=b'', winner=UNKNOWN, diff=0, black_ms=0, white_ms=0):
+        """
+        :param black: 黑方名字
+        :param white: 白方名字
+        :param moves: 落子序列，bytes，每字节为 行 * 8 + 列
+        :param winner: 0 黑胜，1 白胜，2 平局，255 未知
+        :param diff: 黑棋减白棋的棋子差
+        :param black_ms: 黑方用时（毫秒）
+        :param white_ms: 白方用时（毫秒）
+        """
+
+        self.black = black
+        self.white = white
+        self.moves = bytes(moves)
+        self.winner = winner
+        self.diff = diff
+        self.black_ms = black_ms
+        self.white_ms = white_ms
+
+    def move_list(self):
+        """
+        :return: 棋盘坐标形式的落子列表，比如 ['F5', 'D6']
+        """
+
+        return [NAMES[m] for m in self.moves]
+
+    def pack(self):
+        """
+        :return: 序列化后的 bytes
+        """
+
+        black = truncate_name(self.black)
+        white = truncate_name(self.white)
+        header = HEADER.pack(len(self.moves), self.winner, self.diff, len(black), len(white),
+                             int(self.black_ms), int(self.white_ms))
+        return header + black + white + self.moves
+
+    def __repr__(self):
+        return 'GameRecord({!r}, {!r}, {}, winner={}, diff={})'.format(
+            self.black, self.white, ' '.join(self.move_list()), self.winner, self.diff)
+
+
+class RecordWriter(object):
+    """
+    以追加方式写入棋谱文件
+    """
+
+    def __init__(self, path):
+        """
+        :param path: 棋谱文件路径，文件不存在时新建并写入魔数
+        """
+
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, record):
+        """
+        写入一局棋谱
+        :param record: GameRecord
+        """
+
+        self.file.write(record.pack())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_records(data):
+    """
+    从内存中的棋谱数据逐局解析
+    :param data: bytes 或 mmap，需以魔数开头
+    :return: 生成 GameRecord
+    """
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('不是棋谱文件')
+    offset = len(MAGIC)
+    size = len(data)
+    unpack = HEADER.unpack_from
+    while offset < size:
+        n, winner, diff, black_len, white_len, black_ms, white_ms = unpack(data, offset)
+        offset += HEADER.size
+        black = bytes(data[offset:offset + black_len]).decode('utf-8')
+        offset += black_len
+        white = bytes(data[offset:offset + white_len]).decode('utf-8')
+        offset += white_len
+        moves = bytes(data[offset:offset + n])
+        offset += n
+        yield GameRecord(black, white, moves, winner, diff, black_ms, white_ms)
+
+
+def read_records(path):
+    """
+    通过内存映射逐局读取棋谱文件，内存占用与文件大小无关
+    :param path: 棋谱文件路径
+    :return: 生成 GameRecord
+    """
+
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from parse_records(data)
+
+
+def parse_moves(moves):
+    """
+    :param moves: 落子坐标列表或空格分隔的字符串，比如 'F5 D6 C3'
+    :return: 落子 bytes，每字节为 行 * 8 + 列
+    :raise ValueError: 有不存在的坐标
+    """
+
+    if isinstance(moves, str):
+        moves = moves.split()
+    squares = bytearray()
+    for move in moves:
+        if move.upper() not in SQUARES:
+            raise ValueError('不存在的坐标：{}'.format(move))
+        squares.append(SQUARES[move.upper()])
+    return bytes(squares)
+
+
+def replay(record, board=None):
+    """
+    重放棋谱，执棋方无子可下时自动补上弃权
+    :param record: GameRecord、落子 bytes，或 parse_moves() 接受的落子坐标序列
+    :param board: 起始棋盘，None 表示初始局面
+    :return: 生成 (落子前的棋盘, 执棋方, 落子坐标如 'F5')；为了速度，每次产出的是同一个棋盘对象，需要保存时请自行复制
+    :raise ValueError: 棋谱中有非法落子或不存在的坐标
+    """
+
+    if isinstance(record, GameRecord):
+        moves = record.moves
+    elif isinstance(record, (bytes, bytearray)):
+        moves = record
+    else:
+        moves = parse_moves(record)
+    if board is None:
+        board = Board()
+    color = 'X'
+    for m in moves:
+        if m not in NAMES:
+            raise ValueError('不存在的格子编号：{}'.format(m))
+        action = (m >> 3, m & 7)
+        if next(board.get_legal_actions(color), None) is None:
+            color = oppo(color)
+        yield board, color, NAMES[m]
+        if not board._move(action, color):
+            raise ValueError('棋谱中有非法落子：{}'.format(NAMES[m]))
+        color = oppo(color)
+
+
+def final_position(record):
+    """
+    从初始局面重放整个落子序列
+    :param record: 同 replay()
+    :return: (棋盘, 下一步的执棋方)；下一步的执棋方为最后落子一方的对手，是否需要弃权由调用方判断
+    :raise ValueError: 棋谱中有非法落子或不存在的坐标
+    """
+
+    board = Board()
+    color = 'O'
+    for _, color, _ in replay(record, board):
+        pass
+    return board, oppo(color)
+
+
+def final_board(record):
+    """
+    重放整局棋谱
+    :return: 终局棋盘
+    """
+
+    return final_position(record)[0]
@@ -0,0 +1,252 @@
+"""
+并行自我对弈数据生成：多个工作进程用 AIPlayer 对 AIPlayer 下棋，记录每个局面、根节点的访问分布和终局结果，
+经有界队列交给主进程，按固定大小切分写入只追加的 .npy 分片。队列满时工作进程阻塞，内存占用与对局总数无关。
+工作进程出错时错误经队列传回，主进程写出已收到的数据（包括未满的分片）后抛出 RuntimeError。
+
+每个分片包含同一编号的四个文件：
+    boards_00000.npy  (N, 64) int8     0 空，1 执棋方，2 对手
+    policy_00000.npy  (N, 64) float32  根节点各落子的访问比例，下标为 行 * 8 + 列
+    value_00000.npy   (N,)    float32  以执棋方为视角的终局结果，胜 1 平 0 负 -1
+    diff_00000.npy    (N,)    int8     以执棋方为视角的终局棋子差
+
+    python selfplay.py data --games 1000 --workers 8 --player "ai:time_limit=None,max_playouts=400"
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import traceback
+from queue import Empty
+
+import numpy as np
+
+from AIPlayer import AIPlayer
+from board import Board, oppo
+from pattern import encode
+from tournament import parse_spec
+
+
+def play_game(kwargs, rng, temperature_moves=10):
+    """
+    自我对弈一局并记录每个局面
+    :param kwargs: AIPlayer 的参数
+    :param rng: 随机数生成器
+    :param temperature_moves: 前若干步按访问次数比例随机落子，以增加开局多样性
+    :return: {'boards', 'policy', 'value', 'diff'}
+    """
+
+    players = {color: AIPlayer(color, **dict(kwargs, seed=rng.randrange(2 ** 32))) for color in ('X', 'O')}
+    board = Board()
+    color = 'X'
+    boards, policies, colors = [], [], []
+    while True:
+        if len(list(board.get_legal_actions(color))) == 0:
+            color = oppo(color)
+            if len(list(board.get_legal_actions(color))) == 0:
+                break
+            continue
+        action = players[color].get_move(board)
+        policy = np.zeros(64, dtype=np.float32)
+        root = players[color].root
+        if root is not None and root.child:
+            for move, child in root.child.items():
+                x, y = board.board_num(move)
+                policy[x * 8 + y] = child.n
+            if len(boards) < temperature_moves and policy.sum() > 0:
+                index = rng.choices(range(64), weights=policy.tolist())[0]
+                action = board.num_board((index // 8, index % 8))
+            policy /= max(policy.sum(), 1)
+        else:
+            x, y = board.board_num(action)
+            policy[x * 8 + y] = 1
+        boards.append(encode(board, color))
+        policies.append(policy)
+        colors.append(color)
+        board._move(action, color)
+        color = oppo(color)
+    for player in players.values():
+        player.close()
+
+    black_diff = board.count('X') - board.count('O')
+    sign = np.array([1 if c == 'X' else -1 for c in colors], dtype=np.int8)
+    diff = (sign * black_diff).astype(np.int8)
+    return {
+        'boards': np.array(boards, dtype=np.int8),
+        'policy': np.array(policies, dtype=np.float32),
+        'value': np.sign(diff).astype(np.float32),
+        'diff': diff,
+    }
+
+
+def worker(kwargs, games, seed, queue):
+    """
+    工作进程：下完 games 局，每局结果放入队列，出错时放入错误信息字符串，最后放入 None 表示结束
+    """
+
+    rng = random.Random(seed)
+    try:
+        for _ in range(games):
+            queue.put(play_game(kwargs, rng))
+    except Exception:
+        queue.put(traceback.format_exc())
+    finally:
+        queue.put(None)
+
+
+class ShardWriter(object):
+    """
+    按固定大小切分写入 .npy 分片，只追加，不改写已有分片
+    """
+
+    FIELDS = {'boards': ((64,), np.int8), 'policy': ((64,), np.float32), 'value': ((), np.float32),
+              'diff': ((), np.int8)}
+
+    def __init__(self, directory, shard_size=100000):
+        """
+        :param directory: 输出目录，已有分片时从下一个编号继续
+        :param shard_size: 每个分片的局面数
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.shard = len(glob.glob(os.path.join(directory, 'boards_*.npy')))
+        self.buffers = {name: np.zeros((shard_size,) + shape, dtype=dtype)
+                        for name, (shape, dtype) in self.FIELDS.items()}
+        self.size = 0
+        self.total = 0
+
+    def add(self, record):
+        """
+        追加一局的数据
+        :param record: play_game() 的返回值
+        """
+
+        n = len(record['value'])
+        start = 0
+        while start < n:
+            count = min(n - start, self.shard_size - self.size)
+            for name, buffer in self.buffers.items():
+                buffer[self.size:self.size + count] = record[name][start:start + count]
+            self.size += count
+            self.total += count
+            start += count
+            if self.size == self.shard_size:
+                self.flush()
+
+    def flush(self):
+        """
+        把缓冲区写成一个分片
+        """
+
+        if self.size == 0:
+            return
+        for name, buffer in self.buffers.items():
+            path = os.path.join(self.directory, '{}_{:05d}.npy'.format(name, self.shard))
+            np.save(path, buffer[:self.size])
+        self.shard += 1
+        self.size = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_shards(directory):
+    """
+    以内存映射方式逐个读取分片
+    :param directory: 数据目录
+    :return: 生成 {'boards', 'policy', 'value', 'diff'} 字典
+    """
+
+    for path in sorted(glob.glob(os.path.join(directory, 'boards_*.npy'))):
+        suffix = path[-len('00000.npy'):]
+        yield {name: np.load(os.path.join(directory, '{}_{}'.format(name, suffix)), mmap_mode='r')
+               for name in ShardWriter.FIELDS}
+
+
+def generate(directory, games, workers=None, kwargs=None, shard_size=100000, queue_size=64, seed=None,
+             callback=None):
+    """
+    并行生成自我对弈数据
+    :param directory: 输出目录
+    :param games: 对局总数
+    :param workers: 工作进程数，None 表示全部 CPU 核
+    :param kwargs: AIPlayer 的参数，None 表示每步 200 次模拟
+    :param shard_size: 每个分片的局面数
+    :param queue_size: 队列最多缓存的对局数，满时工作进程等待写入
+    :param seed: 随机种子
+    :param callback: 每写入一局调用 callback(已完成局数, 已写入局面数)
+    :return: 写入的局面数
+    :raise RuntimeError: 有工作进程出错或意外退出，已收到的数据仍会写出
+    """
+
+    if kwargs is None:
+        kwargs = {'time_limit': None, 'max_playouts': 200}
+    workers = min(workers or os.cpu_count(), games)
+    rng = random.Random(seed)
+    queue = multiprocessing.Queue(maxsize=queue_size)
+    processes = []
+    for i in range(workers):
+        count = games // workers + (1 if i < games % workers else 0)
+        process = multiprocessing.Process(target=worker, args=(kwargs, count, rng.randrange(2 ** 32), queue),
+                                          daemon=True)
+        process.start()
+        processes.append(process)
+
+    finished, done = 0, 0
+    errors = []
+    try:
+        # 正常结束或出错时，ShardWriter 退出时都会写出未满的分片
+        with ShardWriter(directory, shard_size) as writer:
+            while finished < workers:
+                try:
+                    record = queue.get(timeout=1)
+                except Empty:
+                    if not any(process.is_alive() for process in processes) and queue.empty():
+                        errors.append('{} 个工作进程意外退出'.format(workers - finished))
+                        break
+                    continue
+                if record is None:
+                    finished += 1
+                    continue
+                if isinstance(record, str):
+                    errors.append(record)
+                    continue
+                writer.add(record)
+                done += 1
+                if callback is not None:
+                    callback(done, writer.total)
+    finally:
+        for process in processes:
+            if process.is_alive() and finished < workers:
+                process.terminate()
+            process.join()
+    if errors:
+        raise RuntimeError('自我对弈工作进程出错：\n{}'.format(errors[0]))
+    return writer.total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='并行自我对弈数据生成')
+    parser.add_argument('directory', help='输出目录')
+    parser.add_argument('--games', type=int, default=100, help='对局总数')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认全部 CPU 核')
+    parser.add_argument('--player', default='ai:time_limit=None,max_playouts=200', help='AIPlayer 描述')
+    parser.add_argument('--shard-size', type=int, default=100000, help='每个分片的局面数')
+    parser.add_argument('--queue-size', type=int, default=64, help='队列最多缓存的对局数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    _, kind, player_kwargs = parse_spec(args.player)
+    if kind != 'ai':
+        parser.error('自我对弈只支持 ai 选手')
+    total = generate(args.directory, args.games, args.workers, player_kwargs, args.shard_size, args.queue_size,
+                     args.seed, callback=lambda g, n: print('\r已完成 {} 局，{} 个局面'.format(g, n), end=''))
+    print()
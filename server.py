@@ -0,0 +1,387 @@
+"""
+基于 asyncio 的对局服务器：在一个进程内托管大量人机对局，客户端通过 TCP 或 Unix 套接字发送 JSON 行。
+每个会话按 Game 的规则推进（无子可下自动弃权，连续 3 次非法落子判负），AI 的搜索交给共享的进程池，
+并用信号量限制同时进行的搜索数，事件循环不会被搜索阻塞；工作进程意外退出时进程池会被重建。
+棋谱写入在单独的线程中进行。
+
+请求与响应均为一行 JSON：
+    {"cmd": "new", "color": "X", "level": "normal"}       新建对局，返回会话状态（AI 先手时已落子）
+    {"cmd": "move", "session": "...", "move": "F5"}       人类落子，AI 应手后返回会话状态
+    {"cmd": "state", "session": "..."}                    查询会话状态
+    {"cmd": "resign", "session": "..."}                   认输
+    {"cmd": "close", "session": "..."}                    结束并删除会话
+    {"cmd": "levels"}                                     列出可选的 AI 强度
+会话状态：{"ok": true, "session", "human", "board", "to_move", "legal", "moves", "result"}，
+出错时返回 {"ok": false, "error": "..."}。
+
+    python server.py --port 7788 --workers 4
+    python server.py --unix /tmp/reversi.sock
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from time import monotonic
+
+from board import Board, oppo
+from record import GameRecord, RecordWriter, SQUARES, NAMES
+from tournament import PLAYERS, init_worker, make_player, parse_spec
+
+# AI 强度 -> 选手描述（见 tournament.py）
+LEVELS = {
+    'easy': 'roxanne',
+    'normal': 'ai:time_limit=None,max_playouts=400',
+    'hard': 'ai:time_limit=None,max_playouts=2000',
+}
+
+
+def compute_move(spec, cells, color, seed):
+    """
+    在工作进程中计算 AI 的落子
+    :param spec: 选手描述
+    :param cells: Board.to_string() 的结果
+    :param color: 执棋方
+    :param seed: 随机种子
+    :return: 落子坐标
+    """
+
+    board = Board.from_string(cells)
+    player = make_player(spec, color, random.Random(seed))
+    move = player.get_move(board)
+    if hasattr(player, 'close'):
+        player.close()
+    return move
+
+
+class Session(object):
+    """
+    一局人机对局，按 Game 的规则推进
+    """
+
+    def __init__(self, session_id, human, level, spec):
+        """
+        :param session_id: 会话编号
+        :param human: 人类执棋方
+        :param level: AI 强度名
+        :param spec: AI 的选手描述
+        """
+
+        self.id = session_id
+        self.human = human
+        self.ai = oppo(human)
+        self.level = level
+        self.spec = spec
+        self.board = Board()
+        self.color = 'X'  # 当前下棋方，终局后为 None
+        self.moves = bytearray()
+        self.illegal = 0  # 人类连续非法落子的次数
+        self.result = None  # 终局后为 (赢家, 黑减白棋子差)
+        self.lock = asyncio.Lock()  # 同一会话的请求依次处理
+        self.touched = monotonic()
+
+    def legal_actions(self):
+        if self.color is None:
+            return []
+        return list(self.board.get_legal_actions(self.color))
+
+    def advance(self):
+        """
+        当前一方无子可下时弃权，双方都无子可下时结束对局
+        """
+
+        if self.color is None or self.legal_actions():
+            return
+        self.color = oppo(self.color)
+        if not self.legal_actions():
+            winner, diff = self.board.get_winner()
+            self.finish(winner, [diff, -diff, 0][winner])
+
+    def play(self, move):
+        """
+        当前一方落子
+        :param move: 合法的落子坐标
+        """
+
+        self.board._move(move, self.color)
+        self.moves.append(SQUARES[move])
+        self.color = oppo(self.color)
+        self.advance()
+
+    def finish(self, winner, diff):
+        self.color = None
+        self.result = (winner, diff)
+
+    def forfeit(self, color):
+        """
+        color 一方判负，棋子差记为 0
+        """
+
+        self.finish(1 if color == 'X' else 0, 0)
+
+    def state(self):
+        result = None
+        if self.result is not None:
+            result = {'winner': ['X', 'O', None][self.result[0]], 'diff': self.result[1]}
+        return {'ok': True, 'session': self.id, 'human': self.human, 'level': self.level,
+                'board': self.board.to_string(), 'to_move': self.color, 'legal': self.legal_actions(),
+                'moves': [NAMES[m] for m in self.moves], 'result': result}
+
+    def record(self):
+        """
+        :return: 本局的 GameRecord
+        """
+
+        names = {self.human: 'human', self.ai: self.level}
+        return GameRecord(names['X'], names['O'], self.moves, self.result[0], self.result[1])
+
+
+class GameServer(object):
+    """
+    托管全部会话，AI 搜索在共享进程池中进行
+    """
+
+    def __init__(self, levels=None, workers=None, idle_timeout=3600, recorder=None, seed=None):
+        """
+        :param levels: AI 强度名 -> 选手描述，None 表示 LEVELS
+        :param workers: 进程池大小，也是同时进行的搜索数上限，None 表示全部 CPU 核
+        :param idle_timeout: 会话闲置多少秒后被清理
+        :param recorder: RecordWriter，不为 None 时把结束的对局写入其中
+        :param seed: 随机种子
+        """
+
+        self.levels = dict(LEVELS if levels is None else levels)
+        for spec in self.levels.values():
+            parse_spec(spec)
+        self.workers = workers or os.cpu_count()
+        self.idle_timeout = idle_timeout
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.sessions = {}
+        self.pool = None
+        self.io = None  # 写棋谱的单线程池，RecordWriter 不支持并发写入
+        self.searches = None
+        self.reaper = None
+
+    async def start(self, host='127.0.0.1', port=7788, path=None):
+        """
+        开始监听
+        :param path: Unix 套接字路径，不为 None 时忽略 host 和 port
+        :return: asyncio.Server
+        """
+
+        self.pool = self.new_pool()
+        self.io = ThreadPoolExecutor(max_workers=1)
+        self.searches = asyncio.Semaphore(self.workers)
+        self.reaper = asyncio.ensure_future(self.reap())
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path=path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(PLAYERS,))
+
+    async def stop(self):
+        """
+        取消定期清理会话的任务，需在事件循环中、close() 之前调用
+        """
+
+        if self.reaper is not None:
+            self.reaper.cancel()
+            try:
+                await self.reaper
+            except asyncio.CancelledError:
+                pass
+            self.reaper = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.io is not None:
+            # 等待已提交的棋谱写完
+            self.io.shutdown(wait=True)
+
+    async def reap(self):
+        """
+        定期清理闲置的会话
+        """
+
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60))
+            now = monotonic()
+            for session_id, session in list(self.sessions.items()):
+                if now - session.touched > self.idle_timeout and not session.lock.locked():
+                    del self.sessions[session_id]
+
+    async def handle(self, reader, writer):
+        """
+        处理一个连接，连接上可以依次发送任意多个请求，也可以操作其他连接创建的会话
+        """
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    response = await self.dispatch(json.loads(line))
+                except (ValueError, KeyError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                except Exception as e:
+                    # 任何请求出错都只回复错误，不断开连接
+                    response = {'ok': False, 'error': '{}: {}'.format(type(e).__name__, e)}
+                writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        """
+        处理一个请求
+        :param request: 请求字典
+        :return: 响应字典
+        """
+
+        if not isinstance(request, dict):
+            raise ValueError('请求必须是 JSON 对象')
+        cmd = request.get('cmd')
+        if cmd == 'levels':
+            return {'ok': True, 'levels': sorted(self.levels)}
+        if cmd == 'new':
+            return await self.new_session(request.get('color', 'X'), request.get('level', 'normal'))
+
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise ValueError('会话不存在：{}'.format(request.get('session')))
+        session.touched = monotonic()
+        async with session.lock:
+            if cmd == 'state':
+                return session.state()
+            if cmd == 'move':
+                return await self.human_move(session, str(request.get('move', '')).upper())
+            if cmd == 'resign':
+                if session.result is None:
+                    session.forfeit(session.human)
+                    await self.save(session)
+                return session.state()
+            if cmd == 'close':
+                del self.sessions[session.id]
+                return {'ok': True, 'session': session.id}
+        raise ValueError('未知的命令：{}'.format(cmd))
+
+    async def new_session(self, color, level):
+        if color not in ('X', 'O'):
+            raise ValueError('执棋方只能是 X 或 O')
+        if level not in self.levels:
+            raise ValueError('未知的 AI 强度：{}'.format(level))
+        session = Session(uuid.uuid4().hex, color, level, self.levels[level])
+        self.sessions[session.id] = session
+        async with session.lock:
+            await self.ai_turn(session)
+            return session.state()
+
+    async def human_move(self, session, move):
+        if session.color == session.ai:
+            # 上次 AI 搜索失败，先补上 AI 的落子
+            await self.ai_turn(session)
+        if session.color != session.human:
+            raise ValueError('现在不是你的回合')
+        if move not in session.legal_actions():
+            session.illegal += 1
+            if session.illegal >= 3:
+                # 与 Game 相同：连续 3 次非法落子判负
+                session.forfeit(session.human)
+                await self.save(session)
+                return session.state()
+            return dict(session.state(), ok=False, error='落子不符合规则：{}'.format(move))
+        session.illegal = 0
+        session.play(move)
+        await self.ai_turn(session)
+        return session.state()
+
+    async def ai_turn(self, session):
+        """
+        轮到 AI 时在进程池中搜索并落子，直到轮到人类或对局结束
+        """
+
+        while session.color == session.ai:
+            async with self.searches:
+                move = await self.search(session)
+            if move not in session.legal_actions():
+                session.forfeit(session.ai)
+                break
+            session.play(move)
+        await self.save(session)
+
+    async def search(self, session):
+        """
+        在进程池中计算 AI 的落子，工作进程意外退出时重建进程池并重试一次
+        :return: 落子坐标
+        """
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self.pool
+            try:
+                return await loop.run_in_executor(pool, compute_move, session.spec, session.board.to_string(),
+                                                  session.ai, self.rng.randrange(2 ** 32))
+            except BrokenProcessPool:
+                # 同时失败的多个搜索只重建一次
+                if self.pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.pool = self.new_pool()
+                if attempt:
+                    raise
+
+    async def save(self, session):
+        if self.recorder is not None and session.result is not None:
+            await asyncio.get_running_loop().run_in_executor(self.io, self.write_record, session.record())
+
+    def write_record(self, record):
+        self.recorder.write(record)
+        self.recorder.flush()
+
+
+async def serve(server, host, port, path):
+    listener = await server.start(host, port, path)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='黑白棋对局服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7788)
+    parser.add_argument('--unix', default=None, help='Unix 套接字路径，设置后不监听 TCP')
+    parser.add_argument('--workers', type=int, default=None, help='AI 搜索进程数，默认全部 CPU 核')
+    parser.add_argument('--idle-timeout', type=float, default=3600, help='会话闲置多少秒后被清理')
+    parser.add_argument('--level', action='append', default=[], metavar='NAME=SPEC',
+                        help='增加或覆盖 AI 强度，比如 "hard=ai:time_limit=None,max_playouts=5000"')
+    parser.add_argument('--record', default=None, help='把结束的对局追加写入该棋谱文件')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    levels = dict(LEVELS)
+    for item in args.level:
+        name, _, spec = item.partition('=')
+        levels[name] = spec
+    recorder = RecordWriter(args.record) if args.record else None
+    game_server = GameServer(levels, args.workers, args.idle_timeout, recorder, args.seed)
+    try:
+        asyncio.run(serve(game_server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        game_server.close()
+        if recorder is not None:
+            recorder.close()
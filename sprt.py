@@ -0,0 +1,174 @@
+"""
+序贯概率比检验（SPRT）：候选引擎与基线引擎持续并行对弈，每局结束后更新对数似然比（LLR），
+一旦越过上界即接受 H1（候选强出 elo1），越过下界即接受 H0（候选至多强出 elo0），立即停止。
+
+    python sprt.py "ai:max_playouts=400" "ai:max_playouts=200" --elo0 0 --elo1 20
+"""
+import argparse
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import log
+
+from tournament import PLAYERS, elo_interval, init_worker, parse_spec, play_game
+
+
+def expected_score(elo):
+    """
+    Elo 差对应的期望得分率
+    """
+
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def llr(wins, draws, losses, elo0, elo1):
+    """
+    三项分布下 GSPRT 的对数似然比近似
+    :return: LLR，越大越支持 H1
+    """
+
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0
+    score = (wins + 0.5 * draws) / n
+    # 方差用各项加 0.5 的平滑计数估计，避免全胜或全负时方差为 0
+    w, d, l = wins + 0.5, draws + 0.5, losses + 0.5
+    s = (w + 0.5 * d) / (w + d + l)
+    variance = (w * (1 - s) ** 2 + d * (0.5 - s) ** 2 + l * s ** 2) / (w + d + l)
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+
+class SPRT(object):
+    """
+    SPRT 状态：累计战绩（以候选引擎为视角）并判断是否可以停止
+    """
+
+    def __init__(self, elo0=0, elo1=10, alpha=0.05, beta=0.05):
+        """
+        :param elo0: H0 的 Elo 差
+        :param elo1: H1 的 Elo 差
+        :param alpha: 第一类错误概率（错误接受 H1）
+        :param beta: 第二类错误概率（错误接受 H0）
+        """
+
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = log(beta / (1 - alpha))
+        self.upper = log((1 - beta) / alpha)
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add(self, diff):
+        """
+        记录一局
+        :param diff: 以候选引擎为视角的棋子差
+        """
+
+        if diff > 0:
+            self.wins += 1
+        elif diff < 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def llr(self):
+        return llr(self.wins, self.draws, self.losses, self.elo0, self.elo1)
+
+    def status(self):
+        """
+        :return: 'H1' 接受 H1，'H0' 接受 H0，None 继续
+        """
+
+        value = self.llr
+        if value >= self.upper:
+            return 'H1'
+        if value <= self.lower:
+            return 'H0'
+        return None
+
+    def __str__(self):
+        rating, low, high = elo_interval(self.wins, self.draws, self.losses)
+        return '局数 {:5d}  胜 {:4d} 平 {:4d} 负 {:4d}  Elo {:+6.1f} [{:+6.1f}, {:+6.1f}]  LLR {:+6.3f} [{:+.3f}, {:+.3f}]'.format(
+            self.wins + self.draws + self.losses, self.wins, self.draws, self.losses, rating, low, high,
+            self.llr, self.lower, self.upper)
+
+
+def run(candidate, baseline, test, workers=None, max_games=None, seed=None, callback=print):
+    """
+    并行对弈直到 SPRT 得出结论
+    :param candidate: 候选引擎描述
+    :param baseline: 基线引擎描述
+    :param test: SPRT 对象
+    :param workers: 进程数，None 表示全部 CPU 核
+    :param max_games: 对局数上限，None 表示不限
+    :param seed: 随机种子
+    :param callback: 每局结束时调用 callback(test)，用于输出实时 LLR
+    :return: 'H1'/'H0'，达到对局数上限仍无结论时返回 None
+    """
+
+    rng = random.Random(seed)
+    workers = workers or os.cpu_count()
+    scheduled = 0
+    pending = {}
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(PLAYERS,))
+
+    def submit():
+        nonlocal scheduled
+        # 每两局交换先后手
+        if scheduled % 2 == 0:
+            future = pool.submit(play_game, candidate, baseline, rng.randrange(2 ** 32))
+            pending[future] = 1
+        else:
+            future = pool.submit(play_game, baseline, candidate, rng.randrange(2 ** 32))
+            pending[future] = -1
+        scheduled += 1
+
+    try:
+        # 保持进程池饱和，但不预先排入过多对局，便于及时停止
+        while len(pending) < 2 * workers and (max_games is None or scheduled < max_games):
+            submit()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                sign = pending.pop(future)
+                test.add(sign * future.result())
+                if callback is not None:
+                    callback(test)
+                result = test.status()
+                if result is not None:
+                    return result
+                if max_games is None or scheduled < max_games:
+                    submit()
+        return None
+    finally:
+        # 已得出结论时不必等正在进行的对局下完：取消排队的对局，结束工作进程后再返回
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='引擎改动的 SPRT 检验')
+    parser.add_argument('candidate', help='候选引擎描述，比如 "ai:max_playouts=400"')
+    parser.add_argument('baseline', help='基线引擎描述')
+    parser.add_argument('--elo0', type=float, default=0, help='H0 的 Elo 差')
+    parser.add_argument('--elo1', type=float, default=10, help='H1 的 Elo 差')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认全部 CPU 核')
+    parser.add_argument('--max-games', type=int, default=None, help='对局数上限')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    parse_spec(args.candidate)
+    parse_spec(args.baseline)
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+    result = run(args.candidate, args.baseline, sprt, args.workers, args.max_games, args.seed)
+    print({'H1': '接受 H1：候选引擎更强', 'H0': '接受 H0：候选引擎没有达到预期提升',
+           None: '达到对局数上限，未得出结论'}[result])
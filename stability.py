@@ -0,0 +1,191 @@
+"""
+稳定子分析：稳定子是之后无论怎样落子都不会再被翻转的棋子。
+边上的稳定性预先对全部 3^8 种边的状态穷举计算成表，内部棋子再用逐步扩散的方式判定。
+棋盘用 64 位掩码表示，第 i 行第 j 列对应第 i * 8 + j 位，与 Board.bitboards() 一致。
+"""
+
+
+def _edge_successors(cells):
+    """
+    枚举一条边上所有可能的下一步：任意一方在任意空位落子，并按边上的夹子规则翻转
+    :param cells: 长度 8 的元组，0 空，1 黑，2 白
+    :return: 落子后的状态列表
+    """
+
+    result = []
+    for i in range(8):
+        if cells[i] != 0:
+            continue
+        for color in (1, 2):
+            op_color = 3 - color
+            new = list(cells)
+            new[i] = color
+            for step in (-1, 1):
+                j = i + step
+                while 0 <= j <= 7 and cells[j] == op_color:
+                    j += step
+                if 0 <= j <= 7 and cells[j] == color and abs(j - i) > 1:
+                    for k in range(i + step, j, step):
+                        new[k] = color
+            result.append(tuple(new))
+    return result
+
+
+def _edge_index(cells):
+    """
+    边状态的三进制下标
+    """
+
+    index = 0
+    for i in range(7, -1, -1):
+        index = index * 3 + cells[i]
+    return index
+
+
+def _build_edge_table():
+    """
+    计算全部 3^8 种边状态的稳定子
+    :return: 列表，下标为边状态的三进制下标，值为 8 位稳定掩码
+    """
+
+    table = [None] * 3 ** 8
+
+    def stable(cells):
+        index = _edge_index(cells)
+        if table[index] is not None:
+            return table[index]
+        mask = 0
+        for i in range(8):
+            if cells[i] != 0:
+                mask |= 1 << i
+        for new in _edge_successors(cells):
+            # 棋子要在每一种后续局面中保持不变且仍然稳定
+            unchanged = 0
+            for i in range(8):
+                if cells[i] != 0 and cells[i] == new[i]:
+                    unchanged |= 1 << i
+            mask &= unchanged & stable(new)
+            if mask == 0:
+                break
+        table[index] = mask
+        return mask
+
+    for index in range(3 ** 8):
+        cells = []
+        for _ in range(8):
+            cells.append(index % 3)
+            index //= 3
+        stable(tuple(cells))
+    return table
+
+
+EDGE_TABLE = _build_edge_table()
+
+# 四条边上的格子编号，与边状态的第 0~7 位一一对应
+EDGES = [
+    [j for j in range(8)],
+    [56 + j for j in range(8)],
+    [i * 8 for i in range(8)],
+    [i * 8 + 7 for i in range(8)],
+]
+
+# 横、竖、两条对角线四个方向
+AXES = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+def _build_axis_table():
+    """
+    为每个格子预先计算四个方向上整条线的掩码以及两侧相邻格子的掩码（出界为 0）
+    :return: 长度 64 的列表，每项为 [(整线掩码, 一侧邻格, 另一侧邻格), ...]
+    """
+
+    table = []
+    for x in range(8):
+        for y in range(8):
+            axes = []
+            for dx, dy in AXES:
+                line = 1 << (x * 8 + y)
+                for sign in (1, -1):
+                    i, j = x + sign * dx, y + sign * dy
+                    while 0 <= i <= 7 and 0 <= j <= 7:
+                        line |= 1 << (i * 8 + j)
+                        i += sign * dx
+                        j += sign * dy
+                neighbours = []
+                for sign in (1, -1):
+                    i, j = x + sign * dx, y + sign * dy
+                    neighbours.append(1 << (i * 8 + j) if 0 <= i <= 7 and 0 <= j <= 7 else 0)
+                axes.append((line, neighbours[0], neighbours[1]))
+            table.append(axes)
+    return table
+
+
+AXIS_TABLE = _build_axis_table()
+
+
+def stable_masks(black, white):
+    """
+    计算双方的稳定子
+    :param black: 黑棋 64 位掩码
+    :param white: 白棋 64 位掩码
+    :return: (黑棋稳定子掩码, 白棋稳定子掩码)
+    """
+
+    occupied = black | white
+    stable = 0
+    for edge in EDGES:
+        index = 0
+        for square in reversed(edge):
+            bit = 1 << square
+            index = index * 3 + (1 if black & bit else 2 if white & bit else 0)
+        mask = EDGE_TABLE[index]
+        for i in range(8):
+            if mask >> i & 1:
+                stable |= 1 << edge[i]
+
+    # 内部扩散：四个方向上都要么整线已满，要么一侧是边界或同色稳定子
+    candidates = [s for s in range(64) if occupied >> s & 1 and not stable >> s & 1]
+    changed = True
+    while changed and candidates:
+        changed = False
+        remaining = []
+        for square in candidates:
+            bit = 1 << square
+            own = black if black & bit else white
+            anchored = own & stable
+            for line, side1, side2 in AXIS_TABLE[square]:
+                if line & occupied == line:
+                    continue
+                if side1 == 0 or side2 == 0 or side1 & anchored or side2 & anchored:
+                    continue
+                break
+            else:
+                stable |= bit
+                changed = True
+                continue
+            remaining.append(square)
+        candidates = remaining
+
+    return black & stable, white & stable
+
+
+def stable_discs(board):
+    """
+    计算棋盘上双方的稳定子
+    :param board: 棋盘
+    :return: (黑棋稳定子掩码, 白棋稳定子掩码)
+    """
+
+    return stable_masks(*board.bitboards())
+
+
+def count_stable(board, color):
+    """
+    统计 color 一方的稳定子个数
+    :param board: 棋盘
+    :param color: [X,O] 执棋方
+    :return: 稳定子个数
+    """
+
+    black, white = stable_discs(board)
+    return bin(black if color == 'X' else white).count('1')
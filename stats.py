@@ -0,0 +1,128 @@
+import sys
+import tracemalloc
+
+PHASES = ('select', 'expand', 'simulate', 'evaluate', 'back_prop')
+
+
+def node_bytes(node):
+    """
+    估算一个搜索树节点占用的内存（不含子节点）
+    :param node: 树节点
+    :return: 字节数
+    """
+
+    size = sys.getsizeof(node) + sys.getsizeof(node.__dict__)
+    for value in node.__dict__.values():
+        if isinstance(value, (dict, list)):
+            size += sys.getsizeof(value)
+    return size
+
+
+class SearchStats(object):
+    """
+    单步搜索的统计信息：模拟次数与速度、节点数、搜索深度、各阶段耗时、根节点子节点的访问次数与胜率、内存占用
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+        统计初始化
+        :param trace_memory: 是否用 tracemalloc 记录搜索期间的内存峰值，开启后搜索会明显变慢；
+               关闭时按节点数估算树的内存占用
+        """
+
+        self.trace_memory = trace_memory
+        self.playouts = 0
+        self.nodes = 0
+        self.tree_nodes = 0
+        self.max_depth = 0
+        self.depth_total = 0
+        self.phase_time = {phase: 0.0 for phase in PHASES}
+        self.elapsed = 0.0
+        self.root_children = []
+        self.memory = 0
+        self._tracing = False
+
+    def start(self):
+        """
+        搜索开始时调用
+        """
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+    def record_leaf(self, node):
+        """
+        记录一次模拟到达的叶节点深度
+        :param node: 叶节点
+        """
+
+        depth = 0
+        while node.parent is not None:
+            depth += 1
+            node = node.parent
+        self.playouts += 1
+        self.depth_total += depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def finish(self, root, elapsed, nodes, tree_nodes):
+        """
+        搜索结束时调用，汇总根节点信息和内存占用
+        :param root: 搜索树根节点
+        :param elapsed: 搜索用时（秒）
+        :param nodes: 本次搜索新建的节点数
+        :param tree_nodes: 搜索树当前的节点数
+        """
+
+        self.elapsed = elapsed
+        self.nodes = nodes
+        self.tree_nodes = tree_nodes
+        self.root_children = sorted(((move, child.n, child.w / child.n if child.n else 0.0)
+                                     for move, child in root.child.items()), key=lambda item: -item[1])
+        if self.trace_memory:
+            self.memory = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+        else:
+            self.memory = tree_nodes * node_bytes(root)
+
+    @property
+    def playouts_per_second(self):
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def average_depth(self):
+        return self.depth_total / self.playouts if self.playouts else 0.0
+
+    def as_dict(self):
+        """
+        :return: 便于记录日志或序列化为 JSON 的字典
+        """
+
+        return {
+            'playouts': self.playouts,
+            'playouts_per_second': self.playouts_per_second,
+            'nodes': self.nodes,
+            'tree_nodes': self.tree_nodes,
+            'max_depth': self.max_depth,
+            'average_depth': self.average_depth,
+            'phase_time': dict(self.phase_time),
+            'elapsed': self.elapsed,
+            'root_children': [{'move': move, 'visits': n, 'win_rate': rate}
+                              for move, n, rate in self.root_children],
+            'memory': self.memory,
+        }
+
+    def __str__(self):
+        lines = ['模拟 {} 次，{:.1f} 次/秒，用时 {:.3f} 秒'.format(self.playouts, self.playouts_per_second,
+                                                           self.elapsed),
+                 '新建节点 {}，树节点 {}，最大深度 {}，平均深度 {:.2f}，内存 {:.1f} KB'.format(
+                     self.nodes, self.tree_nodes, self.max_depth, self.average_depth, self.memory / 1024),
+                 '各阶段耗时: ' + ', '.join('{} {:.3f}s'.format(k, v) for k, v in self.phase_time.items())]
+        for move, n, rate in self.root_children:
+            lines.append('  {}: 访问 {} 次，胜率 {:.3f}'.format(move, n, rate))
+        return '\n'.join(lines)
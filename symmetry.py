@@ -0,0 +1,150 @@
+"""
+棋盘的 8 种对称变换（正方形的二面体群）及规范形式。位运算直接作用在 Board.bitboards() 的 64 位掩码上
+（第 i 行第 j 列为第 i * 8 + j 位），落子通过查表变换，每次变换只需十几次整数运算。
+
+变换编号 t 的三个二进制位依次表示：第 0 位左右镜像，第 1 位上下翻转，第 2 位沿主对角线转置，按此顺序作用。
+规范形式取 8 种变换中 (黑, 白) 掩码最小的一种，对称的局面得到相同的规范形式，
+开局库、置换表、结果缓存和训练数据可以共用同一条目：
+
+    black, white, t = canonical_bitboards(*board.bitboards())
+    move = transform_move(book[(black, white, color)], INVERSE[t])   # 变换回原局面的落子
+"""
+from board import Board
+from record import NAMES
+
+MASK = (1 << 64) - 1
+
+
+def mirror(x):
+    """
+    左右镜像：第 j 列变为第 7 - j 列
+    """
+
+    x = ((x >> 1) & 0x5555555555555555) | ((x & 0x5555555555555555) << 1)
+    x = ((x >> 2) & 0x3333333333333333) | ((x & 0x3333333333333333) << 2)
+    return ((x >> 4) & 0x0f0f0f0f0f0f0f0f) | ((x & 0x0f0f0f0f0f0f0f0f) << 4)
+
+
+def flip(x):
+    """
+    上下翻转：第 i 行变为第 7 - i 行
+    """
+
+    return int.from_bytes(x.to_bytes(8, 'little'), 'big')
+
+
+def transpose(x):
+    """
+    沿主对角线（A1-H8）转置：第 i 行第 j 列变为第 j 行第 i 列
+    """
+
+    t = 0x0f0f0f0f00000000 & (x ^ (x << 28))
+    x ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (x ^ (x << 14))
+    x ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (x ^ (x << 7))
+    x ^= t ^ (t >> 7)
+    return x & MASK
+
+
+def transform(x, t):
+    """
+    对掩码作第 t 种变换
+    :param x: 64 位掩码
+    :param t: 变换编号 0~7
+    """
+
+    if t & 1:
+        x = mirror(x)
+    if t & 2:
+        x = flip(x)
+    if t & 4:
+        x = transpose(x)
+    return x
+
+
+def all_transforms(x):
+    """
+    :return: 掩码的全部 8 种变换，下标即变换编号
+    """
+
+    m = mirror(x)
+    f = flip(x)
+    mf = flip(m)
+    images = [x, m, f, mf]
+    return images + [transpose(y) for y in images]
+
+
+# SQUARE_MAPS[t][s]：格子 s 经第 t 种变换后的格子编号
+SQUARE_MAPS = [[transform(1 << s, t).bit_length() - 1 for s in range(64)] for t in range(8)]
+# INVERSE[t]：第 t 种变换的逆变换
+INVERSE = [next(u for u in range(8) if all(SQUARE_MAPS[u][SQUARE_MAPS[t][s]] == s for s in range(64)))
+           for t in range(8)]
+# MOVE_MAPS[t][落子]：落子坐标经第 t 种变换后的坐标
+MOVE_MAPS = [{NAMES[s]: NAMES[SQUARE_MAPS[t][s]] for s in range(64)} for t in range(8)]
+
+
+def transform_move(move, t):
+    """
+    变换落子
+    :param move: 棋盘坐标如 'F5'，或数字坐标如 (4, 5)；None 原样返回
+    :param t: 变换编号
+    :return: 与输入同类型的坐标
+    """
+
+    if move is None:
+        return None
+    if isinstance(move, str):
+        return MOVE_MAPS[t][move.upper()]
+    s = SQUARE_MAPS[t][move[0] * 8 + move[1]]
+    return s >> 3, s & 7
+
+
+def untransform_move(move, t):
+    """
+    transform_move 的逆操作：把规范局面中的落子变换回原局面
+    """
+
+    return transform_move(move, INVERSE[t])
+
+
+def canonical_bitboards(black, white):
+    """
+    规范形式
+    :return: (黑棋掩码, 白棋掩码, 变换编号)，取 8 种变换中 (黑, 白) 最小的一种
+    """
+
+    best = None
+    for t, (b, w) in enumerate(zip(all_transforms(black), all_transforms(white))):
+        if best is None or (b, w) < best[:2]:
+            best = (b, w, t)
+    return best
+
+
+def transform_board(board, t):
+    """
+    :return: 第 t 种变换后的新棋盘
+    """
+
+    black, white = board.bitboards()
+    return Board.from_bitboards(transform(black, t), transform(white, t))
+
+
+def canonical(board):
+    """
+    棋盘的规范形式
+    :return: (规范棋盘, 变换编号)；规范棋盘中的落子用 untransform_move 变换回原棋盘
+    """
+
+    black, white, t = canonical_bitboards(*board.bitboards())
+    return Board.from_bitboards(black, white), t
+
+
+def canonical_key(board, color):
+    """
+    可用作字典键的规范形式，执棋方不参与变换
+    :return: ((黑棋掩码, 白棋掩码, 执棋方), 变换编号)
+    """
+
+    black, white, t = canonical_bitboards(*board.bitboards())
+    return (black, white, color), t
@@ -0,0 +1,35 @@
+"""
+棋谱重放的回归测试
+
+    python -m unittest test_replay
+"""
+import unittest
+
+from perft import check
+from record import final_position
+
+
+class ReplayTest(unittest.TestCase):
+
+    def test_reference_positions(self):
+        self.assertTrue(check(max_start_depth=3, verbose=False))
+
+    def test_pass_only_when_no_legal_move(self):
+        # F5 之后白方有 F4、D6、F6 可下，C3 不能当作白方弃权后黑方的落子
+        with self.assertRaises(ValueError):
+            final_position('F5 C3')
+
+    def test_invalid_square(self):
+        for moves in ('F5 Z9', 'F5 D', 'F5 I1'):
+            with self.assertRaises(ValueError):
+                final_position(moves)
+
+    def test_next_color(self):
+        board, color = final_position('F5 D6')
+        self.assertEqual(color, 'X')
+        self.assertEqual(board.count('X'), 3)
+        self.assertEqual(board.count('O'), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
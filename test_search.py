@@ -0,0 +1,27 @@
+"""
+搜索的回归测试
+
+    python -m unittest test_search
+"""
+import unittest
+
+from AIPlayer import AIPlayer
+from board import Board
+
+# 只剩 6 个空格、黑方走的残局，完整的搜索树只有几百个节点
+ENDGAME = 'OOOOOOX.OOXOOO.OOOXXXXOOOOXOOOXOOXXOXXOOOXOXXOOOOXXXXXOXOXO..X..'
+
+
+class NodeLimitTest(unittest.TestCase):
+
+    def test_node_limit_above_tree_size_terminates(self):
+        # max_nodes 远大于整棵树，且不限时间：搜索树不再增长后必须结束
+        board = Board.from_string(ENDGAME)
+        player = AIPlayer('X', time_limit=None, max_nodes=10 ** 7, seed=1)
+        move = player.get_move(board)
+        self.assertIn(move, list(board.get_legal_actions('X')))
+        self.assertLess(player.tree_size, 10 ** 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+class TimeManager(object):
+    """
+    整局时间管理：根据剩余总时间、对局阶段和空格数给每一步分配思考时间，
+    领先优势已无法被追上时提前结束，前两名落子难分高下时适当延长。
+    """
+
+    def __init__(self, total_time=300, move_limit=60, min_time=0.1, safety=1.0, close_ratio=0.8,
+                 extension=3.0):
+        """
+        时间管理初始化
+        :param total_time: 整局可用的思考总时间（秒）
+        :param move_limit: 单步思考时间上限（秒），比赛规则为 60 秒
+        :param min_time: 单步最少思考时间（秒）
+        :param safety: 为单步上限预留的余量（秒）
+        :param close_ratio: 次优落子访问次数达到最优的该比例时，视为难分高下
+        :param extension: 难分高下时，最多延长到计划时间的倍数
+        """
+
+        self.remaining = total_time
+        self.move_limit = move_limit
+        self.min_time = min_time
+        self.safety = safety
+        self.close_ratio = close_ratio
+        self.extension = extension
+        self.target = 0
+        self.maximum = 0
+
+    def allot(self, board):
+        """
+        为当前这一步分配思考时间
+        :param board: 棋盘
+        :return: (计划时间, 最长时间)
+        """
+
+        empties = board.count(board.empty)
+        # 剩余的己方步数大约是空格数的一半
+        moves_left = max(empties // 2, 1)
+        if empties > 44:
+            # 开局变化少，节省时间
+            weight = 0.6
+        elif empties > 20:
+            # 中局最关键
+            weight = 1.4
+        else:
+            weight = 1.0
+        upper = max(min(self.move_limit - self.safety, self.remaining / 2), self.min_time)
+        self.target = min(max(self.remaining / moves_left * weight, self.min_time), upper)
+        self.maximum = min(self.target * self.extension, upper)
+        return self.target, self.maximum
+
+    def should_stop(self, root, elapsed, playouts):
+        """
+        判断是否可以结束本步搜索
+        :param root: 搜索树根节点
+        :param elapsed: 本步已用时间（秒）
+        :param playouts: 本步已完成的模拟次数
+        :return: True/False 结束/继续搜索
+        """
+
+        if elapsed >= self.maximum:
+            return True
+        if len(root.child) < 2 or playouts == 0 or elapsed <= 0:
+            return elapsed >= self.target
+        first, second = 0, 0
+        for child in root.child.values():
+            if child.n > first:
+                first, second = child.n, first
+            elif child.n > second:
+                second = child.n
+        if elapsed >= self.target:
+            # 前两名接近时延长思考，否则按计划结束
+            return second < first * self.close_ratio
+        # 按当前速度估算剩余模拟次数，次优落子已经追不上时提前结束
+        rate = playouts / elapsed
+        return first - second > rate * (self.target - elapsed)
+
+    def spend(self, elapsed):
+        """
+        记录本步实际用时
+        :param elapsed: 本步用时（秒）
+        """
+
+        self.remaining = max(self.remaining - elapsed, 0)
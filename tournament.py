@@ -0,0 +1,302 @@
+"""
+多进程对局赛：按循环赛或车轮战安排对局，交换先后手，在进程池中用 SilentGame 无打印地对弈，
+统计胜/平/负、平均棋子差，并给出带置信区间的 Elo 差。
+
+    python tournament.py "ai:time_limit=2" "ai:time_limit=3" roxanne random --games 20
+    python tournament.py "new=ai:max_playouts=400" "old=ai:max_playouts=200" --mode gauntlet
+
+选手写作 [名字=]类型[:参数=值,参数=值]，类型见 PLAYERS，可用 register() 注册新的引擎。
+选手按在列表中的下标区分，同一描述可以出现多次。
+"""
+import argparse
+import ast
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import log10, sqrt
+from time import perf_counter
+
+from AIPlayer import AIPlayer, RoxannePlayer, SilentGame
+from RandomPlayer import RandomPlayer
+from record import GameRecord, RecordWriter
+
+
+def _make_ai(color, rng, **kwargs):
+    kwargs.setdefault('seed', rng.randrange(2 ** 32))
+    return AIPlayer(color, **kwargs)
+
+
+def _make_roxanne(color, rng, **kwargs):
+    return RoxannePlayer(color, rng=rng, **kwargs)
+
+
+def _make_random(color, rng, **kwargs):
+    return RandomPlayer(color, rng=rng, verbose=False, **kwargs)
+
+
+# 类型名 -> 构造函数 factory(color, rng, **参数)
+PLAYERS = {
+    'ai': _make_ai,
+    'roxanne': _make_roxanne,
+    'random': _make_random,
+}
+
+
+def register(kind, factory):
+    """
+    注册新的选手类型，需在创建进程池之前调用
+    :param kind: 类型名
+    :param factory: 模块级的构造函数 factory(color, rng, **参数)，返回带 get_move(board) 方法的选手；
+                    需可被 pickle，以便通过 init_worker 传给工作进程
+    """
+
+    PLAYERS[kind] = factory
+
+
+def init_worker(players):
+    """
+    进程池的初始化函数：以 spawn 方式启动的工作进程不会继承 register() 的结果，由此传入
+    :param players: 主进程的 PLAYERS
+    """
+
+    PLAYERS.update(players)
+
+
+def parse_spec(spec):
+    """
+    解析选手描述
+    :param spec: 形如 'fast=ai:time_limit=2,widen=False' 的字符串
+    :return: (名字, 类型, 参数字典)
+    """
+
+    head, _, args = spec.partition(':')
+    name, _, kind = head.rpartition('=')
+    kwargs = {}
+    for item in filter(None, args.split(',')):
+        key, _, value = item.partition('=')
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+    if kind not in PLAYERS:
+        raise ValueError('未知的选手类型：{}'.format(kind))
+    return name or spec, kind, kwargs
+
+
+def make_player(spec, color, rng):
+    """
+    根据描述创建选手
+    :param spec: 选手描述字符串
+    :param color: 执棋方
+    :param rng: 随机数生成器
+    """
+
+    _, kind, kwargs = parse_spec(spec)
+    return PLAYERS[kind](color, rng, **kwargs)
+
+
+def play_game(black_spec, white_spec, seed):
+    """
+    无打印地下完一局
+    :param black_spec: 黑棋选手描述
+    :param white_spec: 白棋选手描述
+    :param seed: 随机种子
+    :return: 黑棋减白棋的棋子差；黑胜为正，白胜为负，平局为 0
+    """
+
+    return play_game_record(black_spec, white_spec, seed).diff
+
+
+def play_game_record(black_spec, white_spec, seed):
+    """
+    无打印地下完一局并返回棋谱
+    :return: GameRecord，用时为双方思考的毫秒数
+    """
+
+    rng = random.Random(seed)
+    black = make_player(black_spec, 'X', rng)
+    white = make_player(white_spec, 'O', rng)
+    game = SilentGame(black, white, record=True)
+    start = perf_counter()
+    winner, diff = game.run()
+    elapsed = (perf_counter() - start) * 1000
+    for player in (black, white):
+        if hasattr(player, 'close'):
+            player.close()
+    # SilentGame 不分别计时，按双方落子数分摊总用时
+    black_moves = (len(game.moves) + 1) // 2
+    share = elapsed / max(len(game.moves), 1)
+    return GameRecord(parse_spec(black_spec)[0], parse_spec(white_spec)[0], game.moves, winner,
+                      [diff, -diff, 0][winner], share * black_moves, share * (len(game.moves) - black_moves))
+
+
+def schedule(specs, games, mode='round-robin'):
+    """
+    安排对局，每对选手交换先后手
+    :param specs: 选手描述列表
+    :param games: 每对选手的对局数
+    :param mode: 'round-robin' 循环赛，'gauntlet' 第一个选手依次对阵其他选手
+    :return: [(黑棋下标, 白棋下标), ...]，下标对应 specs
+    """
+
+    n = len(specs)
+    if mode == 'gauntlet':
+        pairs = [(0, other) for other in range(1, n)]
+    else:
+        pairs = [(a, b) for a in range(n) for b in range(a + 1, n)]
+    pairings = []
+    for a, b in pairs:
+        for g in range(games):
+            pairings.append((a, b) if g % 2 == 0 else (b, a))
+    return pairings
+
+
+def elo(score):
+    """
+    把得分率换算为 Elo 差
+    :param score: 得分率，胜 1 平 0.5 负 0
+    """
+
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * log10(1 / score - 1)
+
+
+def elo_interval(wins, draws, losses, z=1.96):
+    """
+    Elo 差及其置信区间
+    :param z: 正态分位数，1.96 对应 95% 置信区间
+    :return: (Elo 差, 下界, 上界)
+    """
+
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, float('-inf'), float('inf')
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    margin = z * sqrt(variance / n)
+    return elo(score), elo(score - margin), elo(score + margin)
+
+
+class Record(object):
+    """
+    某一选手（或某一对选手中前者）的战绩
+    """
+
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.diff = 0
+
+    def add(self, diff):
+        """
+        :param diff: 以该选手为视角的棋子差
+        """
+
+        if diff > 0:
+            self.wins += 1
+        elif diff < 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        self.diff += diff
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def __str__(self):
+        rating, low, high = elo_interval(self.wins, self.draws, self.losses)
+        return '{:4d} 局 胜 {:4d} 平 {:4d} 负 {:4d}  平均棋子差 {:+6.2f}  Elo {:+7.1f} [{:+7.1f}, {:+7.1f}]'.format(
+            self.games, self.wins, self.draws, self.losses, self.diff / max(self.games, 1), rating, low, high)
+
+
+def tally(players, pairs, black, white, diff):
+    """
+    把一局结果计入战绩
+    :param players: [Record]，下标同 specs
+    :param pairs: {(下标, 下标): Record}，以下标较小的选手为视角
+    :param black: 黑棋下标
+    :param white: 白棋下标
+    :param diff: 黑棋减白棋的棋子差
+    """
+
+    players[black].add(diff)
+    players[white].add(-diff)
+    a, b = min(black, white), max(black, white)
+    pairs.setdefault((a, b), Record()).add(diff if a == black else -diff)
+
+
+def player_names(specs):
+    """
+    :return: 各选手的显示名，重名时加上 #下标
+    """
+
+    names = [parse_spec(spec)[0] for spec in specs]
+    return [name if names.count(name) == 1 else '{}#{}'.format(name, i) for i, name in enumerate(names)]
+
+
+def report(specs, players, pairs):
+    """
+    打印对局赛结果
+    """
+
+    names = player_names(specs)
+    print('\n选手总成绩：')
+    for i, record in enumerate(players):
+        print('{:24} {}'.format(names[i], record))
+    print('\n两两对阵（以前者为视角）：')
+    for (a, b), record in pairs.items():
+        print('{:24} {}'.format('{} vs {}'.format(names[a], names[b]), record))
+
+
+def run(specs, games, mode='round-robin', workers=None, seed=None, callback=None, recorder=None):
+    """
+    进行对局赛
+    :param specs: 选手描述列表
+    :param games: 每对选手的对局数
+    :param mode: 'round-robin' 或 'gauntlet'
+    :param workers: 进程数，None 表示全部 CPU 核
+    :param seed: 随机种子
+    :param callback: 每局结束时调用 callback(黑棋下标, 白棋下标, 棋子差)
+    :param recorder: RecordWriter，不为 None 时把每局棋谱写入其中
+    :return: (按选手汇总的战绩列表，下标同 specs, 按选手下标对汇总的战绩)
+    """
+
+    rng = random.Random(seed)
+    players = [Record() for _ in specs]
+    pairs = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker,
+                             initargs=(PLAYERS,)) as pool:
+        futures = {pool.submit(play_game_record, specs[black], specs[white], rng.randrange(2 ** 32)): (black, white)
+                   for black, white in schedule(specs, games, mode)}
+        for future in as_completed(futures):
+            black, white = futures[future]
+            record = future.result()
+            if recorder is not None:
+                recorder.write(record)
+            diff = record.diff
+            tally(players, pairs, black, white, diff)
+            if callback is not None:
+                callback(black, white, diff)
+    return players, pairs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='多进程对局赛')
+    parser.add_argument('players', nargs='+', help='选手描述，比如 "ai:time_limit=2" roxanne random')
+    parser.add_argument('--games', type=int, default=10, help='每对选手的对局数')
+    parser.add_argument('--mode', choices=['round-robin', 'gauntlet'], default='round-robin')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认全部 CPU 核')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--record', default=None, help='把全部对局追加写入该棋谱文件')
+    args = parser.parse_args()
+
+    for player_spec in args.players:
+        parse_spec(player_spec)
+    if args.record is not None:
+        with RecordWriter(args.record) as writer:
+            players, pairs = run(args.players, args.games, args.mode, args.workers, args.seed, recorder=writer)
+    else:
+        players, pairs = run(args.players, args.games, args.mode, args.workers, args.seed)
+    report(args.players, players, pairs)
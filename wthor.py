@@ -0,0 +1,210 @@
+"""
+流式读取标准黑白棋棋谱库，逐局产出 record.GameRecord，内存占用与棋谱库大小无关：
+
+    WTHOR .wtb：二进制，通过 mmap 读取。16 字节文件头，之后每局 68 字节：
+        赛事编号 H，黑方编号 H，白方编号 H，黑方实际子数 B，黑方理论子数 B，
+        60 步落子，每步 1 字节，取值 10 * 行 + 列（均从 1 开始），0 表示结束
+    GGF：文本，每局形如 (;GM[Othello]PB[..]PW[..]RE[+2.000]TY[8]BO[8 ...]B[d3]W[c5]...;)，
+        分块读取，只保留从标准初始局面开始的 8x8 对局
+
+    for record in read_wtb('WTH_2001.wtb', read_names('WTHOR.JOU')):
+        for board, color, move in replay(record):
+            ...
+    python wthor.py WTH_2001.wtb games.ggf --output games.rvg
+"""
+import argparse
+import mmap
+import os
+import re
+import struct
+
+from record import GameRecord, RecordWriter, SQUARES, UNKNOWN, replay
+
+WTB_HEADER = struct.Struct('<BBBBIHHBBBB')
+WTB_GAME = struct.Struct('<HHHBB60s')
+NAME_SIZE = 20
+
+GGF_PROPERTY = re.compile(r'([A-Z]{1,2})\[([^\]]*)\]')
+# 标准初始局面，按 A1..H1, A2..H2, ... 的顺序，* 为黑，O 为白
+GGF_START = '-' * 27 + 'O*' + '-' * 6 + '*O' + '-' * 27
+
+
+def winner_of(diff):
+    """
+    :param diff: 黑棋减白棋的棋子差
+    :return: 0 黑胜，1 白胜，2 平局
+    """
+
+    if diff > 0:
+        return 0
+    if diff < 0:
+        return 1
+    return 2
+
+
+def read_names(path):
+    """
+    读取 WTHOR 的选手名字文件（WTHOR.JOU），赛事文件（WTHOR.TRN）格式相同
+    :param path: 文件路径
+    :return: {编号: 名字}
+    """
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    count = (len(data) - WTB_HEADER.size) // NAME_SIZE
+    names = {}
+    for i in range(count):
+        offset = WTB_HEADER.size + i * NAME_SIZE
+        names[i] = data[offset:offset + NAME_SIZE].split(b'\0', 1)[0].decode('latin-1').strip()
+    return names
+
+
+def parse_wtb_moves(raw):
+    """
+    把 WTHOR 的落子转为 record 的格式
+    :param raw: 60 字节的落子
+    :return: bytes，每字节为 行 * 8 + 列
+    """
+
+    moves = bytearray()
+    for m in raw:
+        if m == 0:
+            break
+        moves.append((m // 10 - 1) * 8 + m % 10 - 1)
+    return bytes(moves)
+
+
+def read_wtb(path, names=None):
+    """
+    通过内存映射逐局读取 WTHOR .wtb 文件
+    :param path: 文件路径
+    :param names: read_names() 读到的选手名字，None 时以编号作为名字
+    :return: 生成 GameRecord，棋子差按黑方实际子数计算
+    """
+
+    if os.path.getsize(path) <= WTB_HEADER.size:
+        return
+    names = names or {}
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header = WTB_HEADER.unpack_from(data, 0)
+            count, size = header[4], header[7]
+            if size not in (0, 8):
+                raise ValueError('只支持 8x8 棋盘的 WTHOR 文件：{}'.format(path))
+            count = min(count, (len(data) - WTB_HEADER.size) // WTB_GAME.size)
+            for i in range(count):
+                _, black, white, score, _, raw = WTB_GAME.unpack_from(data, WTB_HEADER.size + i * WTB_GAME.size)
+                diff = 2 * score - 64
+                yield GameRecord(names.get(black, str(black)), names.get(white, str(white)),
+                                 parse_wtb_moves(raw), winner_of(diff), diff)
+
+
+def parse_ggf_game(text):
+    """
+    解析一局 GGF
+    :param text: '(;' 与 ';)' 之间的内容
+    :return: GameRecord；不是从标准初始局面开始的 8x8 对局时返回 None
+    """
+
+    moves = bytearray()
+    props = {}
+    for key, value in GGF_PROPERTY.findall(text):
+        if key in ('B', 'W'):
+            move = value.split('/', 1)[0].strip().upper()
+            if move in SQUARES:
+                moves.append(SQUARES[move])
+            elif move not in ('PA', 'PASS'):
+                return None
+        else:
+            props.setdefault(key, value)
+    if props.get('GM', 'Othello').lower() != 'othello' or not props.get('TY', '8').startswith('8'):
+        return None
+    start = props.get('BO', '8 ' + GGF_START).split()
+    squares = ''.join(start[1:])
+    # 末尾一个字符为先手方，须为黑棋
+    if start[0] != '8' or squares[:64] != GGF_START or squares[64:] not in ('', '*'):
+        return None
+
+    result = props.get('RE', '')
+    try:
+        diff = int(round(float(result.split(':', 1)[0])))
+        winner = winner_of(diff)
+    except ValueError:
+        diff, winner = 0, UNKNOWN
+    return GameRecord(props.get('PB', ''), props.get('PW', ''), bytes(moves), winner, diff)
+
+
+def read_ggf(path, chunk_size=1 << 16):
+    """
+    分块逐局读取 GGF 文件
+    :param path: 文件路径
+    :param chunk_size: 每次读取的字符数
+    :return: 生成 GameRecord，跳过非标准开局和无法解析的对局
+    """
+
+    buffer = ''
+    with open(path, encoding='latin-1') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            buffer += chunk
+            while True:
+                end = buffer.find(';)')
+                if end < 0:
+                    break
+                start = buffer.rfind('(;', 0, end)
+                text, buffer = buffer[start + 2:end] if start >= 0 else '', buffer[end + 2:]
+                record = parse_ggf_game(text)
+                if record is not None:
+                    yield record
+            # 只保留最后一局未读完的部分
+            start = buffer.rfind('(;')
+            buffer = buffer[start:] if start >= 0 else buffer[-1:]
+
+
+def read_archive(path, names=None):
+    """
+    按扩展名选择解析器
+    :param path: .wtb 或 .ggf 文件
+    :return: 生成 GameRecord
+    """
+
+    if path.lower().endswith('.wtb'):
+        return read_wtb(path, names)
+    return read_ggf(path)
+
+
+def positions(records):
+    """
+    重放棋谱，逐个产出局面
+    :param records: GameRecord 的可迭代对象
+    :return: 生成 (落子前的棋盘, 执棋方, 落子坐标, GameRecord)；棋盘对象在同一局内复用
+    """
+
+    for record in records:
+        try:
+            for board, color, move in replay(record):
+                yield board, color, move, record
+        except ValueError:
+            # 个别棋谱有误，丢弃其余部分
+            continue
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='读取 WTHOR / GGF 棋谱库')
+    parser.add_argument('archives', nargs='+', help='.wtb 或 .ggf 文件')
+    parser.add_argument('--names', default=None, help='WTHOR 选手名字文件 WTHOR.JOU')
+    parser.add_argument('--output', default=None, help='转换为 record 格式写入该文件')
+    args = parser.parse_args()
+
+    player_names = read_names(args.names) if args.names else None
+    games = 0
+    writer = RecordWriter(args.output) if args.output else None
+    try:
+        for archive in args.archives:
+            for game in read_archive(archive, player_names):
+                games += 1
+                if writer is not None:
+                    writer.write(game)
+    finally:
+        if writer is not None:
+            writer.close()
+    print('共 {} 局'.format(games))